@@ -120,7 +120,7 @@ run_migrations() {
         echo "Running database migrations (attempt $attempt of $max_attempts)..."
         
         # Try running migrations using Flask CLI
-        if FLASK_APP=src.features.web_app.code PYTHONPATH=/app poetry run flask db upgrade "20240124_merge_heads"; then
+        if FLASK_APP=src.features.web_app.code PYTHONPATH=/app poetry run flask db upgrade head; then
             echo "Migrations completed successfully!"
             export DATABASE_URL="${original_db_url}"
             return 0
@@ -187,6 +187,27 @@ with engine.connect() as conn:
     return 1
 }
 
+# Function to wait until another service has migrated the database to head
+wait_for_migrations() {
+    echo "Waiting for migrations..."
+    local max_attempts=30
+    local attempt=1
+    
+    while [ $attempt -le $max_attempts ]; do
+        if FLASK_APP=src.features.web_app.code PYTHONPATH=/app poetry run flask db current 2>/dev/null | grep -q "(head)"; then
+            echo "Database is at the migration head"
+            return 0
+        fi
+        
+        echo "Migrations not applied yet (attempt $attempt of $max_attempts), waiting 10 seconds..."
+        sleep 10
+        attempt=$((attempt + 1))
+    done
+    
+    echo "Database did not reach the migration head after $max_attempts attempts"
+    return 1
+}
+
 case "$1" in
     web)
         # Wait for database before starting web server
@@ -203,15 +224,15 @@ case "$1" in
         export PORT="${PORT:-5000}"
         echo "Binding to port: $PORT"
         exec poetry run gunicorn \
+            --config python:src.features.web_app.gunicorn_conf \
             --bind "0.0.0.0:$PORT" \
-            --workers ${GUNICORN_WORKERS:-2} \
-            --threads ${GUNICORN_THREADS:-4} \
+            --workers ${GUNICORN_WORKERS:-${WEB_CONCURRENCY:-$(nproc)}} \
+            --threads ${GUNICORN_THREADS:-8} \
             --timeout ${GUNICORN_TIMEOUT:-30} \
             --access-logfile - \
             --error-logfile - \
             --log-level ${LOG_LEVEL:-info} \
             --preload \
-            --worker-class gthread \
             --max-requests 1000 \
             --max-requests-jitter 50 \
             --keep-alive 5 \
@@ -219,6 +240,17 @@ case "$1" in
             "src.features.web_app.code:app"
         ;;
         
+    scheduler)
+        # Wait for the web service to migrate the database before starting the periodic jobs
+        wait_for_db
+        if ! wait_for_migrations; then
+            exit 1
+        fi
+        
+        echo "Starting scheduler worker..."
+        exec poetry run python -m src.features.web_app.worker
+        ;;
+        
     test)
         # Wait for database before running tests
         wait_for_db
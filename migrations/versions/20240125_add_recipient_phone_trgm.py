@@ -0,0 +1,37 @@
+"""add trigram index on recipient phone numbers
+
+Revision ID: 20240125_recipient_phone_trgm
+Revises: 20240124_merge_heads
+Create Date: 2024-01-25 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+
+# revision identifiers, used by Alembic.
+revision = '20240125_recipient_phone_trgm'
+down_revision = '20240124_merge_heads'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+def upgrade():
+    """Create a pg_trgm GIN index for substring phone number searches."""
+    if op.get_bind().dialect.name != 'postgresql':
+        logger.info("Skipping trigram index: requires PostgreSQL")
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS recipients_phone_trgm '
+        'ON recipients USING gin (phone_number gin_trgm_ops)'
+    )
+
+def downgrade():
+    """Drop the trigram phone number index."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS recipients_phone_trgm')
@@ -0,0 +1,46 @@
+"""convert user config documents to jsonb
+
+Revision ID: 20240126_user_config_jsonb
+Revises: 20240125_recipient_phone_trgm
+Create Date: 2024-01-26 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+import logging
+
+# revision identifiers, used by Alembic.
+revision = '20240126_user_config_jsonb'
+down_revision = '20240125_recipient_phone_trgm'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+COLUMNS = ('preferences', 'personal_info')
+
+def upgrade():
+    """Store preferences and personal_info as JSONB so they can be updated in place."""
+    if op.get_bind().dialect.name != 'postgresql':
+        logger.info("Skipping JSONB conversion: requires PostgreSQL")
+        return
+
+    for column in COLUMNS:
+        op.alter_column(
+            'user_configs', column,
+            type_=postgresql.JSONB(),
+            postgresql_using=f'{column}::jsonb'
+        )
+
+def downgrade():
+    """Convert preferences and personal_info back to JSON."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for column in COLUMNS:
+        op.alter_column(
+            'user_configs', column,
+            type_=sa.JSON(),
+            postgresql_using=f'{column}::json'
+        )
@@ -0,0 +1,67 @@
+"""add unique covering index on user_configs.recipient_id
+
+Revision ID: 20240127_user_config_uidx
+Revises: 20240126_user_config_jsonb
+Create Date: 2024-01-27 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+
+# revision identifiers, used by Alembic.
+revision = '20240127_user_config_uidx'
+down_revision = '20240126_user_config_jsonb'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+INDEX_NAME = 'user_configs_recipient_id_uidx'
+
+def _check_no_duplicates(bind):
+    """Fail before building the index if any recipient has more than one config."""
+    duplicates = bind.execute(sa.text(
+        'SELECT recipient_id FROM user_configs '
+        'GROUP BY recipient_id HAVING COUNT(*) > 1 LIMIT 10'
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"user_configs has duplicate rows for recipient_id {duplicates}; "
+            "merge or delete them before running this migration"
+        )
+
+def _is_invalid_index(bind, name):
+    """True if a previous CONCURRENTLY build left an INVALID index behind."""
+    return bool(bind.execute(sa.text(
+        'SELECT NOT i.indisvalid FROM pg_index i '
+        'JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name'
+    ), {'name': name}).scalar())
+
+def upgrade():
+    """Create a unique index on recipient_id that also covers name."""
+    bind = op.get_bind()
+    _check_no_duplicates(bind)
+    if bind.dialect.name != 'postgresql':
+        op.create_index(INDEX_NAME, 'user_configs', ['recipient_id'], unique=True)
+        return
+
+    # CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        # IF NOT EXISTS would otherwise keep a half-built index from a failed run
+        if _is_invalid_index(bind, INDEX_NAME):
+            logger.warning("Dropping invalid index %s left by an earlier run", INDEX_NAME)
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}')
+        op.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} '
+            'ON user_configs (recipient_id) INCLUDE (name)'
+        )
+
+def downgrade():
+    """Drop the recipient_id index."""
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_index(INDEX_NAME, table_name='user_configs')
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}')
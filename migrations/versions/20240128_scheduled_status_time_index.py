@@ -0,0 +1,41 @@
+"""add composite status/scheduled_time index on scheduled_messages
+
+Revision ID: 20240128_scheduled_status_time
+Revises: 20240127_user_config_uidx
+Create Date: 2024-01-28 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+
+# revision identifiers, used by Alembic.
+revision = '20240128_scheduled_status_time'
+down_revision = '20240127_user_config_uidx'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+INDEX_NAME = 'ix_scheduled_messages_status_time'
+
+def upgrade():
+    """Index pending-message lookups by status and scheduled time together."""
+    if op.get_bind().dialect.name != 'postgresql':
+        op.create_index(INDEX_NAME, 'scheduled_messages', ['status', 'scheduled_time'])
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} '
+            'ON scheduled_messages (status, scheduled_time)'
+        )
+
+def downgrade():
+    """Drop the composite index."""
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_index(INDEX_NAME, table_name='scheduled_messages')
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}')
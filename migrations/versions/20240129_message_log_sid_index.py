@@ -0,0 +1,41 @@
+"""add index on message_logs.twilio_sid
+
+Revision ID: 20240129_message_log_sid
+Revises: 20240128_scheduled_status_time
+Create Date: 2024-01-29 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+
+# revision identifiers, used by Alembic.
+revision = '20240129_message_log_sid'
+down_revision = '20240128_scheduled_status_time'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+INDEX_NAME = 'ix_message_logs_twilio_sid'
+
+def upgrade():
+    """Index message logs by Twilio SID for delivery status callbacks."""
+    if op.get_bind().dialect.name != 'postgresql':
+        op.create_index(INDEX_NAME, 'message_logs', ['twilio_sid'])
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} '
+            'ON message_logs (twilio_sid)'
+        )
+
+def downgrade():
+    """Drop the Twilio SID index."""
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_index(INDEX_NAME, table_name='message_logs')
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}')
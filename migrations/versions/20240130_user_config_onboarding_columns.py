@@ -0,0 +1,62 @@
+"""move onboarding state out of user config preferences
+
+Revision ID: 20240130_onboarding_columns
+Revises: 20240129_message_log_sid
+Create Date: 2024-01-30 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+
+# revision identifiers, used by Alembic.
+revision = '20240130_onboarding_columns'
+down_revision = '20240129_message_log_sid'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+# preferences['onboarding_stage'] values and their OnboardingStage numbers
+STAGES = {'name': 1, 'interests': 2, 'style': 3, 'time': 4}
+
+def _json_text(dialect, key):
+    """SQL for a top-level preferences key as text."""
+    if dialect == 'postgresql':
+        return f"preferences->>'{key}'"
+    return f"CAST(json_extract(preferences, '$.{key}') AS TEXT)"
+
+def upgrade():
+    """Store the onboarding stage as a SMALLINT and completion as a BOOLEAN column."""
+    op.add_column('user_configs', sa.Column('onboarding_stage', sa.SmallInteger(), nullable=True))
+    op.add_column('user_configs', sa.Column('onboarding_complete', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    dialect = op.get_bind().dialect.name
+    stage_cases = ' '.join(f"WHEN '{name}' THEN {value}" for name, value in STAGES.items())
+    op.execute(
+        f"UPDATE user_configs SET "
+        f"onboarding_stage = CASE {_json_text(dialect, 'onboarding_stage')} {stage_cases} END, "
+        f"onboarding_complete = COALESCE({_json_text(dialect, 'onboarding_complete')}, '') IN ('true', '1')"
+    )
+
+    # The columns are now authoritative; drop the old keys from the documents
+    if dialect == 'postgresql':
+        op.execute("UPDATE user_configs SET preferences = preferences - 'onboarding_stage' - 'onboarding_complete'")
+    else:
+        op.execute("UPDATE user_configs SET preferences = json_remove(preferences, '$.onboarding_stage', '$.onboarding_complete')")
+
+def downgrade():
+    """Copy the onboarding state back into preferences and drop the columns."""
+    if op.get_bind().dialect.name == 'postgresql':
+        stage_cases = ' '.join(f"WHEN {value} THEN '{name}'" for name, value in STAGES.items())
+        op.execute(
+            "UPDATE user_configs SET preferences = preferences || jsonb_strip_nulls(jsonb_build_object("
+            f"'onboarding_stage', CASE onboarding_stage {stage_cases} END, "
+            "'onboarding_complete', CASE WHEN onboarding_complete THEN true END))"
+        )
+    else:
+        logger.warning("Onboarding state is not copied back into preferences: requires PostgreSQL")
+
+    with op.batch_alter_table('user_configs') as batch_op:
+        batch_op.drop_column('onboarding_complete')
+        batch_op.drop_column('onboarding_stage')
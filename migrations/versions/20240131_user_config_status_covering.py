@@ -0,0 +1,45 @@
+"""cover onboarding status columns in the recipient_id index
+
+Revision ID: 20240131_status_covering
+Revises: 20240130_onboarding_columns
+Create Date: 2024-01-31 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+
+# revision identifiers, used by Alembic.
+revision = '20240131_status_covering'
+down_revision = '20240130_onboarding_columns'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+INDEX_NAME = 'user_configs_recipient_id_uidx'
+
+def _rebuild_index(include):
+    """Swap the recipient_id index for one with a new INCLUDE list without blocking writes."""
+    with op.get_context().autocommit_block():
+        # A failed earlier run leaves an INVALID _new index that IF NOT EXISTS would keep
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}_new')
+        op.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME}_new '
+            f'ON user_configs (recipient_id) INCLUDE ({include})'
+        )
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}')
+        op.execute(f'ALTER INDEX {INDEX_NAME}_new RENAME TO {INDEX_NAME}')
+
+def upgrade():
+    """Let onboarding status lookups by recipient be index-only scans."""
+    if op.get_bind().dialect.name != 'postgresql':
+        logger.info("Skipping covering index: INCLUDE requires PostgreSQL")
+        return
+    _rebuild_index('name, onboarding_stage, onboarding_complete')
+
+def downgrade():
+    """Restore the index covering only name."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    _rebuild_index('name')
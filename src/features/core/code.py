@@ -1,8 +1,23 @@
+import enum
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.mutable import MutableDict
+from sqlalchemy.orm import deferred
+
+# JSON document column: JSONB on PostgreSQL, with in-place dict edits tracked for flushes
+JSONDict = MutableDict.as_mutable(JSON().with_variant(JSONB(), 'postgresql'))
 
 db = SQLAlchemy()
 
+class OnboardingStage(enum.IntEnum):
+    """Onboarding steps in the order they are asked; stored as a SMALLINT."""
+    NAME = 1
+    INTERESTS = 2
+    STYLE = 3
+    TIME = 4
+
 class Recipient(db.Model):
     """Represents a message recipient with opt-in/out status."""
     __tablename__ = 'recipients'
@@ -17,12 +32,23 @@ class Recipient(db.Model):
 class UserConfig(db.Model):
     """Stores user configuration and personalization settings."""
     __tablename__ = 'user_configs'
+    __table_args__ = (
+        # One config per recipient; the INCLUDE columns let name and onboarding status
+        # lookups by recipient skip the heap
+        db.Index(
+            'user_configs_recipient_id_uidx', 'recipient_id', unique=True,
+            postgresql_include=['name', 'onboarding_stage', 'onboarding_complete']
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     recipient_id = db.Column(db.Integer, nullable=False)
     name = db.Column(db.String(100), nullable=True)
-    preferences = db.Column(db.JSON, nullable=False, default={})  # Stores GPT prompt preferences
-    personal_info = db.Column(db.JSON, nullable=False, default={})  # Stores additional personal info
+    # JSON blobs load on first access; query with undefer_group('settings') when they are needed
+    preferences = deferred(db.Column(JSONDict, nullable=False, default={}), group='settings')  # Stores GPT prompt preferences
+    personal_info = deferred(db.Column(JSONDict, nullable=False, default={}), group='settings')  # Stores additional personal info
+    onboarding_stage = db.Column(db.SmallInteger, nullable=True)  # OnboardingStage while onboarding, NULL otherwise
+    onboarding_complete = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -37,7 +63,7 @@ class MessageLog(db.Model):
     status = db.Column(db.String(20), nullable=False)  # 'queued', 'sent', 'delivered', 'failed', etc.
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
     delivered_at = db.Column(db.DateTime, nullable=True)
-    twilio_sid = db.Column(db.String(50), nullable=True)
+    twilio_sid = db.Column(db.String(50), nullable=True, index=True)  # Status callbacks look messages up by SID
     error_message = db.Column(db.Text, nullable=True)
     price = db.Column(db.Float, nullable=True)
     price_unit = db.Column(db.String(10), nullable=True)
@@ -46,6 +72,10 @@ class MessageLog(db.Model):
 class ScheduledMessage(db.Model):
     """Tracks scheduled messages for the day."""
     __tablename__ = 'scheduled_messages'
+    __table_args__ = (
+        # Serves the scheduler's "pending and due before X" lookups
+        db.Index('ix_scheduled_messages_status_time', 'status', 'scheduled_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     recipient_id = db.Column(db.Integer, nullable=False)
@@ -9,11 +9,44 @@ Dependencies:
   - rate_limiting
 """
 
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+import asyncio
+import functools
+import hashlib
+import logging
 import random
-from tenacity import retry, stop_after_attempt, wait_exponential, RetryError
-from typing import Optional, Dict, List, TypedDict
-from src.features.rate_limiting.code import rate_limit_openai
+import re
+import threading
+import time
+from collections import OrderedDict
+from tenacity import retry, AsyncRetrying, stop_after_attempt, stop_after_delay, wait_exponential, wait_fixed, RetryError
+from typing import Optional, Dict, List, Tuple, TypedDict
+from src.features.rate_limiting.code import rate_limit_openai, api_limiter
+
+logger = logging.getLogger(__name__)
+
+# Concurrent OpenAI requests in a batch run; each waits for the token bucket before calling
+BATCH_CONCURRENCY = 50
+
+# The sync client serves inbound SMS replies, which must finish well inside the
+# gunicorn graceful timeout (30s): one bounded call, no client-side retries, and
+# generate_message retries only while the first failure came back quickly
+OPENAI_TIMEOUT = 6
+RETRY_BUDGET = 4
+
+# Replies keyed on a hash of (system message, inbound text); short replies like
+# "thanks!" from users with the same settings reuse one completion for an hour
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL = 3600
+_response_cache: 'OrderedDict[bytes, Tuple[float, str]]' = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+_RESPONSE_FALLBACK = "Thank you for your message! Sending you positive vibes! 🌟"
+
+def _response_key(system_message: str, user_message: str) -> bytes:
+    """Cache key for a reply; the inbound text is compared case- and whitespace-insensitively."""
+    normalized = ' '.join(user_message.casefold().split())
+    return hashlib.blake2b(f"{system_message}\n{normalized}".encode(), digest_size=16).digest()
 
 class UserContext(TypedDict, total=False):
     user_name: str
@@ -21,19 +54,86 @@ class UserContext(TypedDict, total=False):
     personal_info: Dict
     previous_messages: List[str]
 
+MAX_SMS_LENGTH = 160
+_WHITESPACE = re.compile(r'\s+')
+_EDGES = re.compile(r'^["\s]+|["\s]+$')
+
+# Used when generation fails; instances extend their own copy
+FALLBACK_MESSAGES = (
+    "Believe in yourself! Every day is a new opportunity to shine.",
+    "You are stronger than you know and braver than you believe.",
+    "Today is full of endless possibilities. Make it amazing!",
+    "Your potential is limitless. Keep pushing forward!",
+    "You've got this! Today is your day to be awesome.",
+)
+
+_SYSTEM_BASE = (
+    "You are a positive, encouraging friend who sends uplifting messages. "
+    "You have a great memory and adapt your communication style based on user preferences. "
+    "You notice patterns in how users like to communicate - for example, if they often use French "
+    "or prefer certain styles of communication. You remember these preferences and incorporate them "
+    "naturally in your responses."
+)
+
+_PROMPT_BASE = (
+    "Generate a short, unique, and uplifting message for today. "
+    "Keep it under 160 characters, personal, and inspiring. "
+    "Don't use hashtags or emojis."
+)
+
+def _text(section: Dict, key: str) -> Optional[str]:
+    """Formatted value of an optional context field, or None when absent."""
+    return f"{section[key]}" if key in section else None
+
+def _items(section: Dict, key: str) -> Optional[tuple]:
+    """Hashable copy of an optional list field, or None when absent."""
+    return tuple(section[key]) if key in section else None
+
+# Prompts depend only on a handful of rarely-changing user fields, so they are
+# memoized on those fields rather than rebuilt for every generation
+@functools.lru_cache(maxsize=1024)
+def _system_message(user_name, communication_style, language, tone, interests, occupation, has_history) -> str:
+    parts = [_SYSTEM_BASE]
+    if user_name:
+        parts.append(f" You're talking to {user_name}.")
+    if communication_style is not None:
+        parts.append(f" Use a {communication_style} communication style.")
+    if language is not None:
+        parts.append(f" Communicate in {language}.")
+    if tone is not None:
+        parts.append(f" Use a {tone} tone.")
+    if interests is not None:
+        parts.append(f" Reference their interests when relevant: {', '.join(interests)}.")
+    if occupation is not None:
+        parts.append(f" Consider their work as {occupation}.")
+    if has_history:
+        parts.append(" Maintain consistency with previous interactions while staying fresh and engaging.")
+    return ''.join(parts)
+
+@functools.lru_cache(maxsize=1024)
+def _prompt(occupation, interests, communication_style, message_time, previous_messages) -> str:
+    parts = [_PROMPT_BASE]
+    if occupation is not None:
+        parts.append(f" Consider their occupation as {occupation}.")
+    if interests is not None:
+        parts.append(f" They enjoy: {', '.join(interests)}.")
+    if communication_style is not None:
+        parts.append(f" Use a {communication_style} tone.")
+    if message_time is not None:
+        parts.append(f" This message is for {message_time} delivery.")
+    if previous_messages:
+        parts.append(" Make it different from these recent messages: ")
+        parts.append(previous_messages)
+    return ''.join(parts)
+
 class MessageGenerator:
     """Handles generation of positive messages using GPT-4."""
     
     def __init__(self, api_key: str):
         """Initialize with OpenAI API key."""
-        self.client = OpenAI(api_key=api_key)
-        self.fallback_messages = [
-            "Believe in yourself! Every day is a new opportunity to shine.",
-            "You are stronger than you know and braver than you believe.",
-            "Today is full of endless possibilities. Make it amazing!",
-            "Your potential is limitless. Keep pushing forward!",
-            "You've got this! Today is your day to be awesome.",
-        ]
+        self.api_key = api_key
+        self.client = OpenAI(api_key=api_key, timeout=OPENAI_TIMEOUT, max_retries=0)
+        self.fallback_messages = FALLBACK_MESSAGES
 
     def generate_message(self, context: Optional[UserContext] = None) -> str:
         """
@@ -43,10 +143,10 @@ class MessageGenerator:
         try:
             return self._try_generate_message(context)
         except (Exception, RetryError) as e:
-            print(f"Error generating message: {str(e)}")
+            logger.error("Error generating message: %s", e)
             return self._get_fallback_message()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @retry(stop=stop_after_attempt(2) | stop_after_delay(RETRY_BUDGET), wait=wait_fixed(1))
     @rate_limit_openai(estimated_tokens=200)  # Lower token estimate for gpt-4o-mini
     def _try_generate_message(self, context: Optional[UserContext] = None, stream: bool = False) -> str:
         """
@@ -81,6 +181,57 @@ class MessageGenerator:
             
         return self._validate_and_clean_message(message)
 
+    def generate_messages(self, contexts: List[Optional[UserContext]]) -> List[str]:
+        """
+        Generate one message per context, issuing the requests concurrently.
+        Results are in the same order as contexts; failures use fallback messages.
+        """
+        if not contexts:
+            return []
+        return asyncio.run(self._generate_messages_async(contexts))
+
+    async def _generate_messages_async(self, contexts: List[Optional[UserContext]]) -> List[str]:
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        # The async client is scoped to this event loop and closed with it
+        async with AsyncOpenAI(api_key=self.api_key) as aclient:
+            async def generate(context):
+                async with semaphore:
+                    return await self.generate_message_async(aclient, context)
+            return await asyncio.gather(*(generate(context) for context in contexts))
+
+    async def generate_message_async(self, aclient: AsyncOpenAI, context: Optional[UserContext] = None) -> str:
+        """Async counterpart of generate_message, with the same retries and fallback."""
+        try:
+            async for attempt in AsyncRetrying(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)):
+                with attempt:
+                    return await self._try_generate_message_async(aclient, context)
+        except (Exception, RetryError) as e:
+            logger.error("Error generating message: %s", e)
+            return self._get_fallback_message()
+
+    async def _try_generate_message_async(self, aclient: AsyncOpenAI, context: Optional[UserContext] = None) -> str:
+        # Wait for the token bucket without blocking the loop; retries are left for API errors
+        while (delay := api_limiter.openai_wait_time(200)) > 0:
+            await asyncio.sleep(delay)
+            
+        completion = await aclient.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": self._build_system_message(context)},
+                {"role": "user", "content": self._build_prompt(context)}
+            ],
+            max_tokens=300,
+            temperature=0.7,
+            top_p=0.9,
+            stream=False
+        )
+        
+        message = completion.choices[0].message.content.strip()
+        if not message:  # If message is empty after stripping
+            raise ValueError("Empty message received from API")
+            
+        return self._validate_and_clean_message(message)
+
     def _stream_completion(self, system_message: str, prompt: str) -> str:
         """Stream the completion and accumulate the response."""
         stream = self.client.chat.completions.create(
@@ -106,10 +257,33 @@ class MessageGenerator:
             
         return self._validate_and_clean_message(message)
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    @rate_limit_openai(estimated_tokens=150)  # Lower token estimate for gpt-4o-mini
     def generate_response(self, user_message: str, context: Optional[UserContext] = None, stream: bool = False) -> str:
-        """Generate a response to a user's inbound message."""
+        """Generate a response to a user's inbound message, reusing a recent identical reply."""
+        # History makes each reply context-specific, so those are never cached
+        if stream or (context and context.get('previous_messages')):
+            return self._generate_response(user_message, context, stream)
+            
+        key = _response_key(self._build_system_message(context), user_message)
+        now = time.monotonic()
+        with _response_cache_lock:
+            cached = _response_cache.get(key)
+            if cached is not None and now - cached[0] < RESPONSE_CACHE_TTL:
+                _response_cache.move_to_end(key)
+                return cached[1]
+                
+        response = self._generate_response(user_message, context)
+        if response != _RESPONSE_FALLBACK:
+            with _response_cache_lock:
+                _response_cache[key] = (now, response)
+                _response_cache.move_to_end(key)
+                if len(_response_cache) > RESPONSE_CACHE_SIZE:
+                    _response_cache.popitem(last=False)
+        return response
+
+    # API errors already fall back inside; the rate limiter does its own backoff
+    @rate_limit_openai(estimated_tokens=150)  # Lower token estimate for gpt-4o-mini
+    def _generate_response(self, user_message: str, context: Optional[UserContext] = None, stream: bool = False) -> str:
+        """Call the API for a reply to an inbound message."""
         try:
             system_message = self._build_system_message(context)
             if stream:
@@ -136,101 +310,64 @@ class MessageGenerator:
             return self._validate_and_clean_message(message)
             
         except Exception as e:
-            print(f"Error generating response: {str(e)}")
-            return "Thank you for your message! Sending you positive vibes! 🌟"
+            logger.error("Error generating response: %s", e)
+            return _RESPONSE_FALLBACK
 
     def _build_system_message(self, context: Optional[UserContext] = None) -> str:
         """Build the system message incorporating user context."""
-        base_message = (
-            "You are a positive, encouraging friend who sends uplifting messages. "
-            "You have a great memory and adapt your communication style based on user preferences. "
-            "You notice patterns in how users like to communicate - for example, if they often use French "
-            "or prefer certain styles of communication. You remember these preferences and incorporate them "
-            "naturally in your responses."
-        )
-        
         if not context:
-            return base_message
-
-        if context.get('user_name'):
-            base_message += f" You're talking to {context['user_name']}."
-            
-        if context.get('preferences'):
-            prefs = context['preferences']
-            if 'communication_style' in prefs:
-                base_message += f" Use a {prefs['communication_style']} communication style."
-            if 'language' in prefs:
-                base_message += f" Communicate in {prefs['language']}."
-            if 'tone' in prefs:
-                base_message += f" Use a {prefs['tone']} tone."
-                
-        if context.get('personal_info'):
-            info = context['personal_info']
-            if 'interests' in info:
-                base_message += f" Reference their interests when relevant: {', '.join(info['interests'])}."
-            if 'occupation' in info:
-                base_message += f" Consider their work as {info['occupation']}."
-            
-        if context.get('previous_messages'):
-            base_message += " Maintain consistency with previous interactions while staying fresh and engaging."
-            
-        return base_message
+            return _SYSTEM_BASE
+        prefs = context.get('preferences') or {}
+        info = context.get('personal_info') or {}
+        return _system_message(
+            context.get('user_name') or None,
+            _text(prefs, 'communication_style'),
+            _text(prefs, 'language'),
+            _text(prefs, 'tone'),
+            _items(info, 'interests'),
+            _text(info, 'occupation'),
+            bool(context.get('previous_messages'))
+        )
 
     def _build_prompt(self, context: Optional[UserContext] = None) -> str:
         """Build the prompt for message generation."""
-        base_prompt = "Generate a short, unique, and uplifting message for today. "
-        base_prompt += "Keep it under 160 characters, personal, and inspiring. "
-        base_prompt += "Don't use hashtags or emojis."
-        
         if not context:
-            return base_prompt
-
-        if context.get('personal_info'):
-            info = context['personal_info']
-            if 'occupation' in info:
-                base_prompt += f" Consider their occupation as {info['occupation']}."
-            if 'interests' in info:
-                base_prompt += f" They enjoy: {', '.join(info['interests'])}."
-
-        if context.get('preferences'):
-            prefs = context['preferences']
-            if 'communication_style' in prefs:
-                base_prompt += f" Use a {prefs['communication_style']} tone."
-            if 'message_time' in prefs:
-                base_prompt += f" This message is for {prefs['message_time']} delivery."
-        
-        if context.get('previous_messages'):
-            base_prompt += " Make it different from these recent messages: "
-            base_prompt += str(context['previous_messages'])
-            
-        return base_prompt
+            return _PROMPT_BASE
+        prefs = context.get('preferences') or {}
+        info = context.get('personal_info') or {}
+        previous = context.get('previous_messages')
+        return _prompt(
+            _text(info, 'occupation'),
+            _items(info, 'interests'),
+            _text(prefs, 'communication_style'),
+            _text(prefs, 'message_time'),
+            str(previous) if previous else None
+        )
 
     def _validate_and_clean_message(self, message: str) -> str:
         """Validate and clean the generated message."""
         if not message:
             return self._get_fallback_message()
             
-        # Remove any newlines or extra spaces
-        message = ' '.join(message.split())
-        
-        # Remove quotes if present
-        message = message.strip('"').strip()
+        # Collapse newlines and runs of spaces, then trim quotes and spaces at the ends
+        message = _EDGES.sub('', _WHITESPACE.sub(' ', message))
         
         # Ensure message isn't too long for SMS
-        if len(message) > 160:
-            message = message[:157] + "..."
+        if len(message) > MAX_SMS_LENGTH:
+            message = message[:MAX_SMS_LENGTH - 3] + "..."
             
         return message
 
     def _get_fallback_message(self) -> str:
         """Get a random fallback message."""
-        return random.choice(self.fallback_messages)
+        messages = self.fallback_messages
+        return messages[random.randrange(len(messages))]
 
     def add_fallback_message(self, message: str) -> None:
         """Add a new fallback message to the collection."""
-        if message and len(message) <= 160:
-            self.fallback_messages.append(message)
+        if message and len(message) <= MAX_SMS_LENGTH:
+            self.fallback_messages += (message,)
 
     def get_fallback_messages(self) -> List[str]:
         """Get the list of fallback messages."""
-        return self.fallback_messages.copy()
+        return list(self.fallback_messages)
@@ -10,15 +10,21 @@ Dependencies:
   - notification_system
 """
 
-from typing import Dict
-from datetime import datetime, timedelta
-import pytz
-from sqlalchemy.orm import Session
+from typing import Any, Dict
+from datetime import datetime, timedelta, timezone
+import logging
+from zoneinfo import ZoneInfo
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, load_only
 from src.features.core.code import ScheduledMessage, Recipient
 from src.features.message_generation.code import MessageGenerator
 from src.features.notification_system.code import SMSService
 from src.features.user_management.code import UserConfigService
 
+logger = logging.getLogger(__name__)
+
+_UTC = timezone.utc
+
 class MessageScheduler:
     """Handles scheduling and processing of daily messages."""
     
@@ -34,21 +40,33 @@ class MessageScheduler:
         """Schedule messages for all active recipients."""
         try:
             # Get all active recipients
-            recipients = self.db.query(Recipient).filter_by(is_active=True).all()
+            # Scheduling only needs the id and timezone of each recipient
+            recipients = self.db.query(Recipient).options(
+                load_only(Recipient.id, Recipient.timezone)
+            ).filter_by(is_active=True).all()
             
             scheduled_count = 0
             failed_count = 0
             
+            # Collect every context first so the messages can be generated concurrently
+            batch = []
             for recipient in recipients:
                 try:
                     # Get user context for personalization
-                    context = self.user_config_service.get_gpt_prompt_context(recipient.id)
-                    
-                    # Generate message content
-                    message_content = self.message_generator.generate_message(context)
-                    
+                    batch.append((recipient, self.user_config_service.get_gpt_prompt_context(recipient.id)))
+                except Exception as e:
+                    logger.error("Failed to schedule message for recipient %s: %s", recipient.id, e)
+                    failed_count += 1
+            
+            # Generate message content
+            contents = self.message_generator.generate_messages([context for _, context in batch])
+            
+            rows = []
+            for (recipient, context), message_content in zip(batch, contents):
+                try:
                     # Calculate scheduled time based on recipient's timezone
-                    recipient_tz = pytz.timezone(recipient.timezone)
+                    # ZoneInfo caches instances by name, and replace()/timedelta keep DST offsets correct
+                    recipient_tz = ZoneInfo(recipient.timezone)
                     now = datetime.now(recipient_tz)
                     
                     # Get user's preferred message time
@@ -60,21 +78,21 @@ class MessageScheduler:
                     if now.hour > hour or (now.hour == hour and now.minute >= minute):
                         scheduled_time += timedelta(days=1)
                     
-                    # Create scheduled message
-                    scheduled_msg = ScheduledMessage(
-                        recipient_id=recipient.id,
-                        scheduled_time=scheduled_time,
-                        content=message_content,
-                        status='pending'
-                    )
-                    
-                    self.db.add(scheduled_msg)
+                    rows.append({
+                        'recipient_id': recipient.id,
+                        'scheduled_time': scheduled_time,
+                        'content': message_content,
+                        'status': 'pending'
+                    })
                     scheduled_count += 1
                     
                 except Exception as e:
-                    print(f"Failed to schedule message for recipient {recipient.id}: {str(e)}")
+                    logger.error("Failed to schedule message for recipient %s: %s", recipient.id, e)
                     failed_count += 1
                     
+            # One batched INSERT for every row; nothing reads the new objects back
+            if rows:
+                self.db.execute(insert(ScheduledMessage), rows)
             self.db.commit()
             return {
                 'scheduled': scheduled_count,
@@ -83,30 +101,36 @@ class MessageScheduler:
             }
             
         except Exception as e:
-            print(f"Error in schedule_daily_messages: {str(e)}")
+            logger.error("Error in schedule_daily_messages: %s", e)
             return {
                 'scheduled': 0,
                 'failed': 0,
                 'total': 0
             }
             
-    def process_scheduled_messages(self) -> Dict[str, int]:
-        """Process all pending scheduled messages that are due."""
+    def process_scheduled_messages(self) -> Dict[str, Any]:
+        """
+        Process all pending scheduled messages that are due.
+        
+        Returns counts plus 'failed_messages', the id, recipient_id and
+        error_message of each message that failed in this run.
+        """
         try:
-            # Get pending messages that are due
-            current_time = datetime.now(pytz.UTC)
-            pending_messages = self.db.query(ScheduledMessage).filter(
+            # Get pending messages that are due, with their recipients in the same query
+            current_time = datetime.now(_UTC)
+            pending_messages = self.db.query(ScheduledMessage, Recipient).outerjoin(
+                Recipient, Recipient.id == ScheduledMessage.recipient_id
+            ).filter(
                 ScheduledMessage.status == 'pending',
                 ScheduledMessage.scheduled_time <= current_time
             ).all()
             
             sent_count = 0
             failed_count = 0
+            failed_messages = []
             
-            for message in pending_messages:
+            for message, recipient in pending_messages:
                 try:
-                    # Get recipient
-                    recipient = self.db.query(Recipient).get(message.recipient_id)
                     if not recipient or not recipient.is_active:
                         message.status = 'cancelled'
                         continue
@@ -123,6 +147,7 @@ class MessageScheduler:
                         message.status = 'failed'
                         message.error_message = result.get('error_message')
                         failed_count += 1
+                        failed_messages.append(self._failure_details(message))
                     else:
                         message.status = 'sent'
                         sent_count += 1
@@ -131,27 +156,39 @@ class MessageScheduler:
                     message.status = 'failed'
                     message.error_message = str(e)
                     failed_count += 1
+                    failed_messages.append(self._failure_details(message))
                     
             self.db.commit()
             return {
                 'sent': sent_count,
                 'failed': failed_count,
-                'total': len(pending_messages)
+                'total': len(pending_messages),
+                'failed_messages': failed_messages
             }
             
         except Exception as e:
-            print(f"Error in process_scheduled_messages: {str(e)}")
+            logger.error("Error in process_scheduled_messages: %s", e)
             return {
                 'sent': 0,
                 'failed': 0,
-                'total': 0
+                'total': 0,
+                'failed_messages': []
             }
             
+    @staticmethod
+    def _failure_details(message: ScheduledMessage) -> Dict[str, Any]:
+        """Summarize a failed message for logging."""
+        return {
+            'id': message.id,
+            'recipient_id': message.recipient_id,
+            'error_message': message.error_message
+        }
+            
     def cleanup_old_records(self) -> Dict[str, int]:
         """Clean up old scheduled message records."""
         try:
             # Delete messages older than 30 days
-            cutoff_date = datetime.now(pytz.UTC) - timedelta(days=30)
+            cutoff_date = datetime.now(_UTC) - timedelta(days=30)
             deleted = self.db.query(ScheduledMessage).filter(
                 ScheduledMessage.scheduled_time < cutoff_date
             ).delete()
@@ -162,7 +199,7 @@ class MessageScheduler:
             }
             
         except Exception as e:
-            print(f"Error in cleanup_old_records: {str(e)}")
+            logger.error("Error in cleanup_old_records: %s", e)
             return {
                 'deleted': 0
             }
@@ -17,6 +17,8 @@ from typing import Optional
 from dataclasses import dataclass
 from datetime import datetime
 
+_NON_DIGITS = re.compile(r'\D')
+
 @dataclass
 class NotificationEvent:
     """Represents a notification event that triggers an SMS."""
@@ -44,7 +46,7 @@ class NotificationManager:
             return phone
             
         # Otherwise, clean and format
-        clean = re.sub(r'\D', '', phone)
+        clean = _NON_DIGITS.sub('', phone)
         if len(clean) == 10:
             return f"+1{clean}"  # Add US country code
         elif len(clean) == 11 and clean.startswith('1'):
@@ -11,10 +11,45 @@ Dependencies:
 
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from requests.adapters import HTTPAdapter
+import certifi
+import functools
 import re
+import ssl
 from typing import Dict, Any, Optional
 from src.features.rate_limiting.code import rate_limit_sms
 
+# Strips everything but digits from user-supplied phone numbers
+_NON_DIGITS = re.compile(r'\D')
+
+# Keep-alive pool for the Twilio session, sized for threaded web workers
+POOL_CONNECTIONS = 20
+POOL_MAXSIZE = 100
+# Seconds per Twilio API call; replies are sent from a thread that must finish before worker shutdown
+TWILIO_TIMEOUT = 5
+
+@functools.lru_cache(maxsize=1)
+def _ssl_context() -> ssl.SSLContext:
+    """Verifying SSL context for Twilio, built once per process."""
+    context = ssl.create_default_context(cafile=certifi.where())
+    context.verify_mode = ssl.CERT_REQUIRED
+    context.check_hostname = True
+    return context
+
+class _TLSAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools all use the shared SSL context."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault('ssl_context', _ssl_context())
+        super().init_poolmanager(*args, **kwargs)
+
+def _pooled_http_client() -> TwilioHttpClient:
+    """Twilio HTTP client that reuses TLS connections across sends."""
+    http_client = TwilioHttpClient(pool_connections=True, timeout=TWILIO_TIMEOUT)
+    http_client.session.mount('https://', _TLSAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE))
+    return http_client
+
 class SMSService:
     """Handles SMS operations using Twilio."""
     
@@ -36,7 +71,7 @@ class SMSService:
             print(f"Initializing Twilio client with account SID: {account_sid[:6]}...")
             print(f"Using phone number: {from_number}")
             
-            self.client = Client(account_sid, auth_token)
+            self.client = Client(account_sid, auth_token, http_client=_pooled_http_client())
             
             # Verify credentials by making a test API call
             try:
@@ -76,7 +111,7 @@ class SMSService:
             return phone
             
         # Otherwise, clean and format
-        clean = re.sub(r'\D', '', phone)
+        clean = _NON_DIGITS.sub('', phone)
         if len(clean) == 10:
             formatted = f"+1{clean}"  # Add US country code
         elif len(clean) == 11 and clean.startswith('1'):
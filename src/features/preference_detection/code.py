@@ -11,7 +11,7 @@ dependencies:
 """
 
 from typing import Dict, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer_group
 from src.features.core.code import UserConfig
 
 class PreferenceDetector:
@@ -31,11 +31,19 @@ class PreferenceDetector:
         Returns:
             Dict of detected preferences
         """
-        detected_prefs = self._detect_preferences(user_message)
+        detected_prefs = self.detect_preferences(user_message)
         if detected_prefs:
-            self._update_user_preferences(recipient_id, detected_prefs)
+            self.save_preferences(recipient_id, detected_prefs)
         return detected_prefs
     
+    def detect_preferences(self, user_message: str) -> Dict:
+        """Detect preferences from a message without touching the database."""
+        return self._detect_preferences(user_message)
+    
+    def save_preferences(self, recipient_id: int, detected_prefs: Dict) -> None:
+        """Merge detected preferences into the user's stored config."""
+        self._update_user_preferences(recipient_id, detected_prefs)
+    
     def _detect_preferences(self, message: str) -> Dict:
         """
         Detect preferences from a message.
@@ -74,7 +82,9 @@ class PreferenceDetector:
     
     def _update_user_preferences(self, recipient_id: int, new_prefs: Dict) -> None:
         """Update user preferences in the database."""
-        config = self.db.query(UserConfig).filter_by(recipient_id=recipient_id).first()
+        config = self.db.query(UserConfig).options(
+            undefer_group('settings')
+        ).filter_by(recipient_id=recipient_id).first()
         
         if not config:
             config = UserConfig(recipient_id=recipient_id, preferences={})
@@ -91,5 +101,7 @@ class PreferenceDetector:
     
     def get_user_preferences(self, recipient_id: int) -> Optional[Dict]:
         """Get current preferences for a user."""
-        config = self.db.query(UserConfig).filter_by(recipient_id=recipient_id).first()
+        config = self.db.query(UserConfig).options(
+            undefer_group('settings')
+        ).filter_by(recipient_id=recipient_id).first()
         return config.preferences if config else None
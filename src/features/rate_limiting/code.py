@@ -10,7 +10,6 @@ import time
 from datetime import datetime
 import threading
 import logging
-from typing import Dict, Any
 import os
 
 logger = logging.getLogger(__name__)
@@ -19,12 +18,15 @@ class APIRateLimiter:
     """Manages rate limits for external API calls."""
     
     def __init__(self):
+        tokens_per_min = int(os.getenv('OPENAI_TOKENS_PER_MIN', '20000'))
+        requests_per_min = int(os.getenv('OPENAI_REQUESTS_PER_MIN', '100'))
+        # Token buckets: allowances refill continuously up to the per-minute limit
         self.openai_limits = {
-            'tokens_per_min': int(os.getenv('OPENAI_TOKENS_PER_MIN', '20000')),
-            'requests_per_min': int(os.getenv('OPENAI_REQUESTS_PER_MIN', '100')),
-            'last_reset': datetime.now(),
-            'token_count': 0,
-            'request_count': 0
+            'tokens_per_min': tokens_per_min,
+            'requests_per_min': requests_per_min,
+            'token_allowance': float(tokens_per_min),
+            'request_allowance': float(requests_per_min),
+            'last_refill': time.monotonic()
         }
         
         self.twilio_limits = {
@@ -37,15 +39,20 @@ class APIRateLimiter:
         
         self._lock = threading.Lock()
         
-    def _reset_if_needed(self, limits: Dict[str, Any], reset_interval_seconds: int) -> None:
-        """Reset counters if the reset interval has passed."""
-        now = datetime.now()
-        seconds_since_reset = (now - limits['last_reset']).total_seconds()
-        
-        if seconds_since_reset >= reset_interval_seconds:
-            limits['token_count'] = 0
-            limits['request_count'] = 0
-            limits['last_reset'] = now
+    def _refill_openai(self) -> None:
+        """Top up the OpenAI allowances for the time elapsed since the last refill."""
+        limits = self.openai_limits
+        now = time.monotonic()
+        elapsed = now - limits['last_refill']
+        limits['last_refill'] = now
+        limits['token_allowance'] = min(
+            limits['tokens_per_min'],
+            limits['token_allowance'] + elapsed * limits['tokens_per_min'] / 60
+        )
+        limits['request_allowance'] = min(
+            limits['requests_per_min'],
+            limits['request_allowance'] + elapsed * limits['requests_per_min'] / 60
+        )
             
     def _reset_daily_if_needed(self) -> None:
         """Reset daily message counter if day has changed."""
@@ -64,16 +71,34 @@ class APIRateLimiter:
         Returns:
             bool: True if within limits, False otherwise
         """
+        return self.openai_wait_time(token_count) == 0
+        
+    def openai_wait_time(self, token_count: int) -> float:
+        """
+        Take an OpenAI call from the buckets, or say how long until one is available.
+        
+        Args:
+            token_count: Estimated token count for this request
+            
+        Returns:
+            float: 0 if the call was allowed, otherwise seconds until the buckets
+            hold enough for it (nothing is taken in that case)
+        """
         with self._lock:
-            self._reset_if_needed(self.openai_limits, 60)  # Reset every minute
+            self._refill_openai()
+            limits = self.openai_limits
+            # A request larger than the bucket is allowed once the bucket is full
+            tokens_needed = min(token_count, limits['tokens_per_min'])
             
-            if (self.openai_limits['token_count'] + token_count > self.openai_limits['tokens_per_min'] or
-                self.openai_limits['request_count'] + 1 > self.openai_limits['requests_per_min']):
-                return False
+            if limits['token_allowance'] < tokens_needed or limits['request_allowance'] < 1:
+                return max(
+                    (tokens_needed - limits['token_allowance']) * 60 / limits['tokens_per_min'],
+                    (1 - limits['request_allowance']) * 60 / limits['requests_per_min']
+                )
                 
-            self.openai_limits['token_count'] += token_count
-            self.openai_limits['request_count'] += 1
-            return True
+            limits['token_allowance'] -= token_count
+            limits['request_allowance'] -= 1
+            return 0.0
             
     def check_twilio_limit(self) -> bool:
         """
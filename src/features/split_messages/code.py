@@ -7,7 +7,7 @@ authors: Cline
 date_created: 2024-01-20
 dependencies:
   - scheduler.py
-  - models.py
+  - core
   - sms_service.py
 """
 
@@ -15,7 +15,7 @@ from datetime import datetime
 import random
 from typing import Tuple, Dict
 from sqlalchemy.orm import Session
-from ...models import Recipient, ScheduledMessage, MessageLog
+from src.features.core.code import Recipient, ScheduledMessage, MessageLog
 
 class SplitMessageService:
     """Handles splitting and scheduling secret messages between users."""
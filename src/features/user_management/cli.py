@@ -1,17 +1,48 @@
 import click
+import csv
+import functools
+import json
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from .models import Base, Recipient
-from .user_config_service import UserConfigService
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Load, sessionmaker
+from sqlalchemy.pool import NullPool
+from src.features.core.code import db, Recipient, UserConfig
+from .code import UserConfigService, split_list
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # Optional: speeds up large configure-bulk CSV files
+    pa = None
+
+# pyarrow reads CSV input in 1 MiB blocks
+CSV_BLOCK_SIZE = 1 << 20
+
+# Dialect-specific INSERT constructs that support ON CONFLICT DO NOTHING
+UPSERT_INSERTS = {
+    'postgresql': pg_insert,
+    'sqlite': sqlite_insert
+}
+
+@functools.lru_cache(maxsize=1)
+def get_sessionmaker():
+    """Build the engine and create the schema once per process."""
+    database_url = os.getenv('DATABASE_URL', 'postgresql://localhost/sms_app')
+    # A CLI run uses one connection and exits, so skip connection pooling
+    engine_options = {'poolclass': NullPool}
+    if database_url.startswith('postgresql'):
+        # Send executemany() batches as multi-row VALUES statements
+        engine_options['executemany_mode'] = 'values_plus_batch'
+    engine = create_engine(database_url, **engine_options)
+    # Same models and metadata as the web app
+    db.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
 
 def get_db_session():
     """Get database session."""
-    database_url = os.getenv('DATABASE_URL', 'postgresql://localhost/sms_app')
-    engine = create_engine(database_url)
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    return Session()
+    return get_sessionmaker()()
 
 @click.group()
 def cli():
@@ -47,8 +78,8 @@ def configure(phone, name, timezone, style, topics, occupation, hobbies):
             click.echo(f"Found existing recipient: {phone}")
 
         # Prepare preferences and personal info
-        topics_list = [t.strip() for t in topics.split(',')]
-        hobbies_list = [h.strip() for h in hobbies.split(',')]
+        topics_list = split_list(topics)
+        hobbies_list = split_list(hobbies)
         
         preferences = {
             'style': style,
@@ -90,47 +121,176 @@ def configure(phone, name, timezone, style, topics, occupation, hobbies):
     finally:
         session.close()
 
+def read_csv_rows(file_path):
+    """Read CSV rows as dicts of strings, using pyarrow's parser when it is installed."""
+    with open(file_path, newline='') as f:
+        if pa is None:
+            return list(csv.DictReader(f))
+        header = next(csv.reader(f), [])
+
+    # Keep every column as text so phone numbers are never parsed as integers
+    table = pa_csv.read_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in header})
+    )
+    return table.to_pylist()
+
+def load_bulk_rows(file_path):
+    """Load user rows from a CSV or JSON file."""
+    if file_path.lower().endswith('.json'):
+        with open(file_path) as f:
+            rows = json.load(f)
+    else:
+        rows = read_csv_rows(file_path)
+
+    for row in rows:
+        for key in ('topics', 'hobbies'):
+            value = row.get(key) or []
+            if isinstance(value, str):
+                value = split_list(value)
+            row[key] = value
+    return rows
+
 @cli.command()
-@click.option('--phone', help='Filter by phone number (optional)')
-def list_users(phone):
+@click.option('--file', 'file_path', required=True, type=click.Path(exists=True, dir_okay=False),
+              help='CSV or JSON file with phone, name, timezone, style, topics, occupation, hobbies')
+def configure_bulk(file_path):
+    """Configure many users at once from a CSV or JSON file."""
+    session = get_db_session()
+
+    try:
+        # Last row wins when a phone number appears more than once
+        rows = list({row['phone']: row for row in load_bulk_rows(file_path) if row.get('phone')}.values())
+        if not rows:
+            click.echo("No users found in file")
+            return
+
+        recipient_rows = [
+            {
+                'phone_number': row['phone'],
+                'timezone': row.get('timezone') or 'UTC',
+                'is_active': True
+            }
+            for row in rows
+        ]
+
+        # Insert all recipients in one statement, skipping phone numbers that already exist
+        insert_factory = UPSERT_INSERTS.get(session.bind.dialect.name)
+        if insert_factory:
+            stmt = insert_factory(Recipient).on_conflict_do_nothing(index_elements=['phone_number'])
+        else:
+            existing = set(session.scalars(
+                select(Recipient.phone_number).where(
+                    Recipient.phone_number.in_([r['phone_number'] for r in recipient_rows])
+                )
+            ))
+            recipient_rows = [r for r in recipient_rows if r['phone_number'] not in existing]
+            stmt = insert(Recipient)
+        if recipient_rows:
+            session.execute(stmt, recipient_rows)
+
+        # Resolve recipient ids and skip users that are already configured
+        recipient_ids = dict(session.execute(
+            select(Recipient.phone_number, Recipient.id).where(
+                Recipient.phone_number.in_([row['phone'] for row in rows])
+            )
+        ).all())
+        configured = set(session.scalars(
+            select(UserConfig.recipient_id).where(
+                UserConfig.recipient_id.in_(recipient_ids.values())
+            )
+        ))
+
+        config_rows = [
+            {
+                'recipient_id': recipient_ids[row['phone']],
+                'name': row.get('name'),
+                'preferences': {
+                    'style': row.get('style'),
+                    'topics': row['topics']
+                },
+                'personal_info': {
+                    'occupation': row.get('occupation'),
+                    'hobbies': row['hobbies']
+                }
+            }
+            for row in rows
+            if recipient_ids[row['phone']] not in configured
+        ]
+        if config_rows:
+            session.execute(insert(UserConfig), config_rows)
+
+        session.commit()
+        click.echo(f"{len(config_rows)} users configured ({len(rows) - len(config_rows)} already configured)")
+
+    except Exception as e:
+        session.rollback()
+        click.echo(f"Error: {str(e)}", err=True)
+    finally:
+        session.close()
+
+def _format_fields(fields):
+    """Format a settings dict as indented 'key: value' lines."""
+    return [
+        f"  {k}: {', '.join(v) if isinstance(v, list) else v}"
+        for k, v in fields.items()
+    ]
+
+@cli.command()
+@click.option('--phone', help='Filter by phone number prefix, e.g. +1806 (optional)')
+@click.option('--contains', is_flag=True, help='Match --phone anywhere in the number instead of as a prefix')
+@click.option('--limit', default=100, show_default=True, help='Maximum number of users to list')
+@click.option('--count', 'count_only', is_flag=True, help='Only print the number of matching users')
+def list_users(phone, contains, limit, count_only):
     """List all configured users or search by phone number."""
     session = get_db_session()
-    user_config_service = UserConfigService(session)
 
     try:
         query = session.query(Recipient)
         if phone:
-            query = query.filter(Recipient.phone_number.like(f"%{phone}%"))
+            if contains:
+                # Substring match is served by the recipients_phone_trgm GIN index
+                query = query.filter(Recipient.phone_number.contains(phone, autoescape=True))
+            else:
+                # Pass a literal 'prefix%' pattern (startswith() sends LIKE :p || '%'),
+                # which the recipients_phone_trgm GIN index can serve under any collation
+                pattern = phone.replace('/', '//').replace('%', '/%').replace('_', '/_') + '%'
+                query = query.filter(Recipient.phone_number.like(pattern, escape='/'))
+
+        if count_only:
+            click.echo(query.with_entities(func.count(Recipient.id)).scalar())
+            return
 
-        recipients = query.all()
-        if not recipients:
+        # Load each recipient's config in the same query instead of one lookup per row
+        rows = query.add_entity(UserConfig).outerjoin(
+            UserConfig, UserConfig.recipient_id == Recipient.id
+        ).options(
+            Load(UserConfig).undefer_group('settings')
+        ).order_by(Recipient.id).limit(limit).all()
+        if not rows:
             click.echo("No users found")
             return
 
-        for recipient in recipients:
-            config = user_config_service.get_config(recipient.id)
-            click.echo("\n" + "="*50)
-            click.echo(f"Phone: {recipient.phone_number}")
-            click.echo(f"Active: {recipient.is_active}")
-            click.echo(f"Timezone: {recipient.timezone}")
+        for recipient, config in rows:
+            lines = [
+                "\n" + "="*50,
+                f"Phone: {recipient.phone_number}",
+                f"Active: {recipient.is_active}",
+                f"Timezone: {recipient.timezone}"
+            ]
             
             if config:
-                click.echo(f"Name: {config.name or 'Not set'}")
+                lines.append(f"Name: {config.name or 'Not set'}")
                 if config.preferences:
-                    click.echo("\nPreferences:")
-                    for k, v in config.preferences.items():
-                        if isinstance(v, list):
-                            click.echo(f"  {k}: {', '.join(v)}")
-                        else:
-                            click.echo(f"  {k}: {v}")
+                    lines.append("\nPreferences:")
+                    lines.extend(_format_fields(config.preferences))
                 if config.personal_info:
-                    click.echo("\nPersonal Info:")
-                    for k, v in config.personal_info.items():
-                        if isinstance(v, list):
-                            click.echo(f"  {k}: {', '.join(v)}")
-                        else:
-                            click.echo(f"  {k}: {v}")
-            click.echo("="*50)
+                    lines.append("\nPersonal Info:")
+                    lines.extend(_format_fields(config.personal_info))
+            lines.append("="*50)
+            # One write per recipient instead of one per field
+            click.echo("\n".join(lines))
 
     except Exception as e:
         click.echo(f"Error: {str(e)}", err=True)
@@ -9,11 +9,135 @@ Dependencies:
   - message_generation
 """
 
-from typing import Dict, Any, Optional, Tuple
-from sqlalchemy.orm import Session
-from src.features.core.code import UserConfig, Recipient
+import copy
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import cast, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session, undefer_group
+from src.features.core.code import UserConfig, Recipient, OnboardingStage
 from src.features.message_generation.code import MessageGenerator
 
+# Comma separator with any surrounding whitespace, for list-valued answers
+_CSV_SPLIT = re.compile(r'\s*,\s*')
+
+def split_list(value: str) -> List[str]:
+    """Split a comma-separated answer into stripped, non-empty items."""
+    return [item for item in _CSV_SPLIT.split(value.strip()) if item]
+
+# Fixed onboarding replies, built once at import
+_WELCOME = (
+    "Welcome! 👋 I'm your daily positivity companion, powered by AI. "
+    "I'll send you personalized messages to brighten your day. "
+    "First, what's your name?"
+)
+_ASK_NAME = (
+    "Let's get started with personalizing your experience! "
+    "What's your name?"
+)
+_ASK_INTERESTS = (
+    "Great! To make your messages more meaningful, "
+    "what are some of your interests or hobbies? "
+    "(Separate multiple interests with commas)"
+)
+_STYLE_OPTIONS = (
+    "1. Professional & Motivational - Focused on growth and achievement\n"
+    "2. Friendly & Casual - Like a supportive friend\n"
+    "3. Short & Direct - Brief, impactful messages\n\n"
+    "Reply with 1, 2, or 3"
+)
+_STYLE_MENU = "How would you like your daily messages? Choose a style:\n\n" + _STYLE_OPTIONS
+_ASK_TIME = (
+    "Last step! When would you like to receive your daily message?\n\n"
+    "Enter a time in 24-hour format (e.g., 09:00 for 9 AM, 14:30 for 2:30 PM)\n"
+    "I'll send your personalized message at this time each day."
+)
+_RESTART = (
+    "Let's start fresh with your personalization! "
+    "What's your name?"
+)
+_RESUME_PROMPTS = {
+    OnboardingStage.NAME: _ASK_NAME,
+    OnboardingStage.INTERESTS: _ASK_INTERESTS,
+    OnboardingStage.STYLE: _STYLE_MENU,
+    OnboardingStage.TIME: _ASK_TIME
+}
+_NAME_SAVED_SUFFIX = (
+    "! 👋\n\n"
+    "Now, tell me about your interests or hobbies. "
+    "This helps me create messages that resonate with you. "
+    "For example: reading, fitness, cooking, travel"
+)
+_INTERESTS_SAVED = (
+    "Thanks for sharing your interests! 🌟\n\n"
+    "How would you like your daily messages?\n\n" + _STYLE_OPTIONS
+)
+_STYLE_SAVED = (
+    "What time would you like to receive your daily message? (24-hour format)\n"
+    "For example: 09:00 for 9 AM, 14:30 for 2:30 PM"
+)
+# Onboarding answers for the style and time questions
+_STYLE_CHOICES = {
+    '1': 'professional',
+    '2': 'casual',
+    '3': 'direct'
+}
+_TIME_PATTERN = re.compile(r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$')
+_INVALID_TIME = "Please enter a valid time in 24-hour format (e.g., 09:00, 14:30)"
+_START_OVER = "I didn't quite get that. Let's start over."
+_WELCOME_FALLBACK_SUFFIX = (
+    " style and interests. "
+    "Text STOP anytime to pause messages, or RESTART to update your preferences.\n\n"
+    "Your first personalized message is coming soon!"
+)
+
+# GPT prompt contexts keyed on (recipient_id, updated_at); any config update changes the key
+PROMPT_CONTEXT_CACHE_SIZE = 1024
+_prompt_context_cache: 'OrderedDict[Tuple[int, datetime], Dict[str, Any]]' = OrderedDict()
+_prompt_context_lock = threading.Lock()
+
+def get_prompt_context(db: Session, recipient_id: int) -> Dict[str, Any]:
+    """
+    Get context for GPT prompt generation, reusing a cached copy while the
+    user's config is unchanged.
+    """
+    updated_at = db.query(UserConfig.updated_at).filter(
+        UserConfig.recipient_id == recipient_id
+    ).limit(1).scalar()
+    key = (recipient_id, updated_at)
+    
+    with _prompt_context_lock:
+        cached = _prompt_context_cache.get(key)
+        if cached is not None:
+            _prompt_context_cache.move_to_end(key)
+            return copy.deepcopy(cached)
+            
+    row = db.query(
+        UserConfig.name, UserConfig.preferences, UserConfig.personal_info
+    ).filter(UserConfig.recipient_id == recipient_id).limit(1).first()
+    if not row:
+        return {}
+        
+    context = {}
+    if row.name:
+        context['user_name'] = row.name
+    if row.preferences:
+        context['preferences'] = row.preferences
+    if row.personal_info:
+        context['personal_info'] = row.personal_info
+        
+    if updated_at is not None:
+        with _prompt_context_lock:
+            # Keep a private copy so callers mutating the result can't corrupt the cache
+            _prompt_context_cache[key] = copy.deepcopy(context)
+            if len(_prompt_context_cache) > PROMPT_CONTEXT_CACHE_SIZE:
+                _prompt_context_cache.popitem(last=False)
+                
+    return context
+
 class UserConfigService:
     """Manages user configuration and preferences."""
     
@@ -46,23 +170,29 @@ class UserConfigService:
         
     def get_config(self, recipient_id: int) -> Optional[UserConfig]:
         """Get user configuration."""
-        return self.db.query(UserConfig).filter_by(recipient_id=recipient_id).first()
+        return self.db.query(UserConfig).options(
+            undefer_group('settings')
+        ).filter_by(recipient_id=recipient_id).first()
+        
+    def update_preferences(self, recipient_id: int, preferences: Dict[str, Any]) -> Optional[UserConfig]:
+        """Update just the preferences portion of a user's config."""
+        config = self.get_config(recipient_id)
+        if config:
+            config.preferences = preferences
+            self.db.commit()
+        return config
+        
+    def update_personal_info(self, recipient_id: int, personal_info: Dict[str, Any]) -> Optional[UserConfig]:
+        """Update just the personal_info portion of a user's config."""
+        config = self.get_config(recipient_id)
+        if config:
+            config.personal_info = personal_info
+            self.db.commit()
+        return config
         
     def get_gpt_prompt_context(self, recipient_id: int) -> Dict[str, Any]:
         """Get context for GPT prompt generation."""
-        config = self.get_config(recipient_id)
-        if not config:
-            return {}
-            
-        context = {}
-        if config.name:
-            context['user_name'] = config.name
-        if config.preferences:
-            context['preferences'] = config.preferences
-        if config.personal_info:
-            context['personal_info'] = config.personal_info
-            
-        return context
+        return get_prompt_context(self.db, recipient_id)
 
 class OnboardingService:
     """Manages user onboarding process."""
@@ -71,172 +201,196 @@ class OnboardingService:
         self.db = db_session
         self.message_generator = message_generator
         
+    def _load_config(self, recipient_id: int) -> Optional[UserConfig]:
+        """Load a user's config together with its deferred JSON columns."""
+        return self.db.query(UserConfig).options(
+            undefer_group('settings')
+        ).filter_by(recipient_id=recipient_id).first()
+        
+    def _merge_preferences(self, config: UserConfig, changes: Dict[str, Any], **columns: Any) -> None:
+        """
+        Merge top-level keys into a user's preferences and set any other
+        columns given as keyword arguments.
+
+        On PostgreSQL this is a single UPDATE using JSONB '||', so it carries
+        only the changed keys instead of the whole document.
+        """
+        if self.db.get_bind().dialect.name != 'postgresql':
+            config.preferences.update(changes)
+            for name, value in columns.items():
+                setattr(config, name, value)
+            return
+
+        self.db.execute(
+            update(UserConfig)
+            .where(UserConfig.id == config.id)
+            .values(preferences=UserConfig.preferences.op('||')(cast(changes, JSONB)), **columns),
+            execution_options={'synchronize_session': False}
+        )
+        self.db.expire(config, ['preferences', *columns])
+        
     def start_onboarding(self, recipient_id: int) -> str:
-        """Start onboarding process for a new user."""
-        config = self.db.query(UserConfig).filter_by(recipient_id=recipient_id).first()
+        """
+        Start onboarding process for a new user.
+
+        A new config is only flushed; the caller's commit for the rest of the
+        message saves it.
+        """
+        config = self._load_config(recipient_id)
         
         if not config:
             config = UserConfig(
                 recipient_id=recipient_id,
-                preferences={'onboarding_stage': 'name'}
+                preferences={},
+                onboarding_stage=OnboardingStage.NAME
             )
             self.db.add(config)
-            self.db.commit()
-            return (
-                "Welcome! 👋 I'm your daily positivity companion, powered by AI. "
-                "I'll send you personalized messages to brighten your day. "
-                "First, what's your name?"
-            )
+            self.db.flush()
+            return _WELCOME
             
         # Resume onboarding from last stage
-        stage = config.preferences.get('onboarding_stage', 'name')
-        if stage == 'name':
-            return (
-                "Let's get started with personalizing your experience! "
-                "What's your name?"
-            )
-        elif stage == 'interests':
-            return (
-                "Great! To make your messages more meaningful, "
-                "what are some of your interests or hobbies? "
-                "(Separate multiple interests with commas)"
-            )
-        elif stage == 'style':
-            return (
-                "How would you like your daily messages? Choose a style:\n\n"
-                "1. Professional & Motivational - Focused on growth and achievement\n"
-                "2. Friendly & Casual - Like a supportive friend\n"
-                "3. Short & Direct - Brief, impactful messages\n\n"
-                "Reply with 1, 2, or 3"
-            )
-        elif stage == 'time':
-            return (
-                "Last step! When would you like to receive your daily message?\n\n"
-                "Enter a time in 24-hour format (e.g., 09:00 for 9 AM, 14:30 for 2:30 PM)\n"
-                "I'll send your personalized message at this time each day."
-            )
-        else:
-            return (
-                "Let's start fresh with your personalization! "
-                "What's your name?"
-            )
+        stage = config.onboarding_stage or OnboardingStage.NAME
+        return _RESUME_PROMPTS.get(stage, _RESTART)
             
-    def process_response(self, recipient_id: int, response: str) -> Tuple[str, bool]:
+    def process_response(self, recipient_id: int, response: str, commit: bool = True) -> Tuple[str, bool]:
         """
         Process user response during onboarding.
         Returns (next_message, is_complete).
+
+        All changes for one response are committed together at the end.
+        Callers that own the transaction pass ``commit=False``: the changes
+        are only flushed, errors are left for the caller to roll back, and a
+        completing answer returns an empty reply so the caller can commit
+        before sending welcome_message().
         """
-        config = self.db.query(UserConfig).filter_by(recipient_id=recipient_id).first()
+        config = self._load_config(recipient_id)
         if not config:
-            return self.start_onboarding(recipient_id), False
+            reply = self.start_onboarding(recipient_id)
+            if commit:
+                self.db.commit()
+            return reply, False
             
-        stage = config.preferences.get('onboarding_stage', 'name')
-        
-        if stage == 'name':
-            config.name = response.strip()
-            config.preferences['onboarding_stage'] = 'interests'
-            self.db.commit()
-            return (
-                f"Nice to meet you, {config.name}! 👋\n\n"
-                "Now, tell me about your interests or hobbies. "
-                "This helps me create messages that resonate with you. "
-                "For example: reading, fitness, cooking, travel"
-            ), False
+        handler = self._STAGE_HANDLERS.get(config.onboarding_stage or OnboardingStage.NAME)
+        if handler is None:
+            return _START_OVER, False
             
-        elif stage == 'interests':
-            interests = [i.strip() for i in response.split(',')]
-            if not config.personal_info:
-                config.personal_info = {}
-            config.personal_info['interests'] = interests
-            config.preferences['onboarding_stage'] = 'style'
-            self.db.commit()
-            return (
-                "Thanks for sharing your interests! 🌟\n\n"
-                "How would you like your daily messages?\n\n"
-                "1. Professional & Motivational - Focused on growth and achievement\n"
-                "2. Friendly & Casual - Like a supportive friend\n"
-                "3. Short & Direct - Brief, impactful messages\n\n"
-                "Reply with 1, 2, or 3"
-            ), False
+        if not commit:
+            reply, is_complete = handler(self, config, response)
+            self.db.flush()
+            return reply, is_complete
             
-        elif stage == 'style':
-            style_map = {
-                '1': 'professional',
-                '2': 'casual',
-                '3': 'direct'
-            }
-            style = style_map.get(response.strip(), 'casual')
-            config.preferences['communication_style'] = style
-            config.preferences['onboarding_stage'] = 'time'
+        try:
+            reply, is_complete = handler(self, config, response)
             self.db.commit()
-            return (
-                "What time would you like to receive your daily message? (24-hour format)\n"
-                "For example: 09:00 for 9 AM, 14:30 for 2:30 PM"
-            ), False
+        except Exception:
+            self.db.rollback()
+            raise
             
-        elif stage == 'time':
-            try:
-                # Validate time format
-                import re
-                if not re.match(r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$', response.strip()):
-                    return "Please enter a valid time in 24-hour format (e.g., 09:00, 14:30)", False
-                
-                hour, minute = map(int, response.strip().split(':'))
-                config.preferences['message_time'] = f"{hour:02d}:{minute:02d}"
-                config.preferences['onboarding_complete'] = True
-                del config.preferences['onboarding_stage']
-                self.db.commit()
-                
-                # Generate personalized welcome message
-                try:
-                    welcome = self.message_generator.generate_message(
-                        self.get_gpt_prompt_context(recipient_id)
-                    )
-                except Exception:
-                    welcome = (
-                        f"Perfect! You're all set to receive daily positive messages at {config.preferences['message_time']}. 🎉\n\n"
-                        f"I'll craft messages that match your {style} style and interests. "
-                        "Text STOP anytime to pause messages, or RESTART to update your preferences.\n\n"
-                        "Your first personalized message is coming soon!"
-                    )
-                    
-                return welcome, True
-                
-            except ValueError:
-                return "Please enter a valid time in 24-hour format (e.g., 09:00, 14:30)", False
+        if is_complete:
+            # Generate the personalized welcome outside the transaction
+            reply = self._welcome_message(recipient_id, config)
+            
+        return reply, is_complete
+        
+    # Stage handlers: apply one answer and return (reply, is_complete)
+    
+    def _answer_name(self, config: UserConfig, response: str) -> Tuple[str, bool]:
+        config.name = response.strip()
+        config.onboarding_stage = OnboardingStage.INTERESTS
+        return f"Nice to meet you, {config.name}" + _NAME_SAVED_SUFFIX, False
+        
+    def _answer_interests(self, config: UserConfig, response: str) -> Tuple[str, bool]:
+        if not config.personal_info:
+            config.personal_info = {}
+        config.personal_info['interests'] = split_list(response)
+        config.onboarding_stage = OnboardingStage.STYLE
+        return _INTERESTS_SAVED, False
+        
+    def _answer_style(self, config: UserConfig, response: str) -> Tuple[str, bool]:
+        style = _STYLE_CHOICES.get(response.strip(), 'casual')
+        self._merge_preferences(
+            config,
+            {'communication_style': style},
+            onboarding_stage=OnboardingStage.TIME
+        )
+        return _STYLE_SAVED, False
+        
+    def _answer_time(self, config: UserConfig, response: str) -> Tuple[str, bool]:
+        # Validate time format
+        answer = response.strip()
+        if not _TIME_PATTERN.match(answer):
+            return _INVALID_TIME, False
             
-        return "I didn't quite get that. Let's start over.", False
+        hour, minute = map(int, answer.split(':'))
+        self._merge_preferences(
+            config,
+            {'message_time': f"{hour:02d}:{minute:02d}"},
+            onboarding_stage=None,
+            onboarding_complete=True
+        )
+        return '', True
+        
+    _STAGE_HANDLERS = {
+        OnboardingStage.NAME: _answer_name,
+        OnboardingStage.INTERESTS: _answer_interests,
+        OnboardingStage.STYLE: _answer_style,
+        OnboardingStage.TIME: _answer_time
+    }
+        
+    def welcome_message(self, recipient_id: int) -> str:
+        """Welcome text for a user who has just finished onboarding."""
+        return self._welcome_message(recipient_id, self._load_config(recipient_id))
+        
+    def _welcome_message(self, recipient_id: int, config: UserConfig) -> str:
+        """Generate a personalized welcome message, falling back to a fixed one."""
+        try:
+            return self.message_generator.generate_message(
+                self.get_gpt_prompt_context(recipient_id)
+            )
+        except Exception:
+            return (
+                f"Perfect! You're all set to receive daily positive messages at {config.preferences['message_time']}. 🎉\n\n"
+                f"I'll craft messages that match your {config.preferences.get('communication_style', 'casual')}"
+                + _WELCOME_FALLBACK_SUFFIX
+            )
+        
+    @staticmethod
+    def _status_columns():
+        """(in_onboarding, is_complete) columns for status queries."""
+        return (UserConfig.onboarding_stage.isnot(None), UserConfig.onboarding_complete)
+        
+    def onboarding_status(self, recipient_id: int) -> Tuple[bool, bool]:
+        """Return (in_onboarding, is_complete) for a user from one query."""
+        row = self.db.query(*self._status_columns()).filter(
+            UserConfig.recipient_id == recipient_id
+        ).limit(1).first()
+        if row is None:
+            return False, False
+        return bool(row[0]), bool(row[1])
+        
+    def bulk_onboarding_status(self, recipient_ids: List[int]) -> Dict[int, Tuple[bool, bool]]:
+        """
+        Return (in_onboarding, is_complete) for many users from one query.
+        Users without a config are reported as (False, False).
+        """
+        status = dict.fromkeys(recipient_ids, (False, False))
+        if not status:
+            return status
+        rows = self.db.query(UserConfig.recipient_id, *self._status_columns()).filter(
+            UserConfig.recipient_id.in_(list(status))
+        )
+        for recipient_id, in_onboarding, is_complete in rows:
+            status[recipient_id] = (bool(in_onboarding), bool(is_complete))
+        return status
         
     def is_in_onboarding(self, recipient_id: int) -> bool:
         """Check if user is currently in onboarding."""
-        config = self.db.query(UserConfig).filter_by(recipient_id=recipient_id).first()
-        return bool(
-            config and 
-            config.preferences and 
-            'onboarding_stage' in config.preferences
-        )
+        return self.onboarding_status(recipient_id)[0]
         
     def is_onboarding_complete(self, recipient_id: int) -> bool:
         """Check if user has completed onboarding."""
-        config = self.db.query(UserConfig).filter_by(recipient_id=recipient_id).first()
-        return bool(
-            config and 
-            config.preferences and 
-            config.preferences.get('onboarding_complete', False)
-        )
+        return self.onboarding_status(recipient_id)[1]
         
     def get_gpt_prompt_context(self, recipient_id: int) -> Dict[str, Any]:
         """Get context for GPT prompt generation."""
-        config = self.db.query(UserConfig).filter_by(recipient_id=recipient_id).first()
-        if not config:
-            return {}
-            
-        context = {}
-        if config.name:
-            context['user_name'] = config.name
-        if config.preferences:
-            context['preferences'] = config.preferences
-        if config.personal_info:
-            context['personal_info'] = config.personal_info
-            
-        return context
+        return get_prompt_context(self.db, recipient_id)
@@ -0,0 +1,52 @@
+"""
+Shared fixtures for user management tests.
+
+Stateless helpers and the database connection are session-scoped so they
+are built once per run; each test's changes are rolled back.
+"""
+
+import os
+import pytest
+from click.testing import CliRunner
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from .config import UserConfig
+from .onboarding import OnboardingManager
+from features.core.code import db as models
+
+@pytest.fixture(scope="session")
+def connection():
+    """Open one database connection and create the schema for the whole run."""
+    engine = create_engine(os.getenv('DATABASE_URL', 'sqlite:///:memory:'))
+    with engine.connect() as conn:
+        models.metadata.create_all(conn)
+        conn.commit()
+        yield conn
+    engine.dispose()
+
+@pytest.fixture
+def db(connection):
+    """Create test database session, rolled back after each test."""
+    transaction = connection.begin()
+    # Commits inside a test only release a SAVEPOINT
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+
+@pytest.fixture
+def user_config():
+    """Create test user configuration."""
+    return UserConfig(user_id=1)
+
+@pytest.fixture(scope="session")
+def onboarding_manager():
+    """Create test onboarding manager."""
+    return OnboardingManager()
+
+@pytest.fixture(scope="session")
+def cli_runner():
+    """Create CLI test runner."""
+    return CliRunner()
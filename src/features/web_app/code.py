@@ -2,26 +2,64 @@ from flask import Flask, request, jsonify
 from flask_migrate import Migrate
 from twilio.request_validator import RequestValidator
 from flask_apscheduler import APScheduler
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MISSED
 from asgiref.wsgi import WsgiToAsgi
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import json
 import logging
 from logging.config import dictConfig
-from datetime import datetime
-import pytz
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import os
-import ssl
 import certifi
 import urllib3
+from sqlalchemy import select, func, exists, insert, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from src.features.rate_limiting.code import limiter
+from src.features.web_app.health_wsgi import HealthInterceptor
+
+@dataclass(frozen=True)
+class EnvConfig:
+    """Process environment settings, read once at import. Field names are the lower-cased variable names."""
+    openai_api_key: Optional[str] = None
+    twilio_account_sid: Optional[str] = None
+    twilio_auth_token: Optional[str] = None
+    twilio_from_number: Optional[str] = None
+    twilio_enabled: Optional[str] = None
+    flask_app: Optional[str] = None
+    flask_env: Optional[str] = None
+    flask_debug: Optional[str] = None
+    flask_db_migrate: Optional[str] = None
+    database_url: Optional[str] = None
+    port: Optional[str] = None
+    verify_twilio_on_boot: Optional[str] = None
+    gunicorn_threads: Optional[str] = None
+    db_pool_size: Optional[str] = None
+    db_max_overflow: Optional[str] = None
+
+    @classmethod
+    def from_environ(cls, environ=os.environ):
+        """Snapshot the variables this module uses."""
+        return cls(**{field.name: environ.get(field.name.upper()) for field in fields(cls)})
+
+    def get(self, key):
+        """Look up a setting by its environment variable name."""
+        return getattr(self, key.lower())
+
+ENV_CONFIG = EnvConfig.from_environ()
+
+# Resolve the CA bundle path once
+_CA_BUNDLE = certifi.where()
 
 # Configure SSL for requests
-urllib3.util.ssl_.DEFAULT_CERTS = certifi.where()
-
-def create_ssl_context():
-    """Create a secure SSL context with system certificates."""
-    context = ssl.create_default_context(cafile=certifi.where())
-    context.verify_mode = ssl.CERT_REQUIRED
-    context.check_hostname = True
-    return context
+urllib3.util.ssl_.DEFAULT_CERTS = _CA_BUNDLE
 
 # Configure logging
 dictConfig({
@@ -51,12 +89,25 @@ scheduler = APScheduler()
 limiter.init_app(app)
 
 # Configure SQLAlchemy
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///app.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = ENV_CONFIG.database_url or 'sqlite:///app.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Threads answering inbound SMS in each process (see inbound_executor)
+INBOUND_WORKERS = 4
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    # The pool is per process: size it for this process's request and inbound
+    # threads so workers x pool stays inside the Postgres connection limit
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(ENV_CONFIG.db_pool_size or int(ENV_CONFIG.gunicorn_threads or 8) + INBOUND_WORKERS),
+        'max_overflow': int(ENV_CONFIG.db_max_overflow or 2),
+        'pool_pre_ping': True,
+        'pool_recycle': 1800
+    }
 
 # Configure APScheduler
 app.config['SCHEDULER_API_ENABLED'] = False
 app.config['SCHEDULER_TIMEZONE'] = 'UTC'
+# Collapse missed runs into one and never overlap a slow job with its next tick
+app.config['SCHEDULER_JOB_DEFAULTS'] = {'coalesce': True, 'max_instances': 1}
 
 # Import models and initialize db
 from src.features.core.code import db, Recipient, UserConfig, MessageLog, ScheduledMessage
@@ -79,35 +130,43 @@ user_config_service = None
 onboarding_service = None
 sms_service = None
 message_scheduler = None
+preference_detector = None
+
+# Environment variables read by init_services
+REQUIRED_ENV_KEYS = ('OPENAI_API_KEY', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_FROM_NUMBER')
+ENV_KEYS = REQUIRED_ENV_KEYS + ('TWILIO_ENABLED', 'FLASK_APP', 'FLASK_ENV', 'FLASK_DEBUG', 'DATABASE_URL')
+# Logged as set/unset only
+PRESENCE_ONLY_KEYS = frozenset(REQUIRED_ENV_KEYS + ('DATABASE_URL',))
+TWILIO_ENV_KEYS = ('TWILIO_ENABLED', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_FROM_NUMBER')
+# Variables safe to dump when configuration is incomplete
+_SECRET_MARKERS = ('key', 'token', 'secret', 'password')
+LOGGABLE_ENV_KEYS = tuple(sorted(
+    key for key in os.environ
+    if not any(marker in key.lower() for marker in _SECRET_MARKERS)
+))
 
 def init_services():
     """Initialize all services. Called after database is ready."""
-    global message_generator, user_config_service, onboarding_service, sms_service, message_scheduler
+    global message_generator, user_config_service, onboarding_service, sms_service, message_scheduler, preference_detector
     
     if message_generator is None:
         # Log environment state
         app.logger.info("Checking environment configuration...")
+        env = {key: ENV_CONFIG.get(key) for key in ENV_KEYS}
         env_vars = {
-            'TWILIO_ENABLED': os.getenv('TWILIO_ENABLED'),
-            'OPENAI_API_KEY': bool(os.getenv('OPENAI_API_KEY')),
-            'TWILIO_ACCOUNT_SID': bool(os.getenv('TWILIO_ACCOUNT_SID')),
-            'TWILIO_AUTH_TOKEN': bool(os.getenv('TWILIO_AUTH_TOKEN')),
-            'TWILIO_FROM_NUMBER': bool(os.getenv('TWILIO_FROM_NUMBER')),
-            'FLASK_APP': os.getenv('FLASK_APP'),
-            'FLASK_ENV': os.getenv('FLASK_ENV'),
-            'FLASK_DEBUG': os.getenv('FLASK_DEBUG'),
-            'DATABASE_URL': bool(os.getenv('DATABASE_URL'))
+            key: bool(value) if key in PRESENCE_ONLY_KEYS else value
+            for key, value in env.items()
         }
         app.logger.info(f"Environment state: {env_vars}")
         
         # Check if Twilio is enabled (case-insensitive)
-        twilio_enabled_raw = os.getenv('TWILIO_ENABLED', 'false')
+        twilio_enabled_raw = env['TWILIO_ENABLED'] or 'false'
         app.logger.info(f"Raw TWILIO_ENABLED value: {twilio_enabled_raw}")
         app.logger.info(f"Environment keys: {[k for k in os.environ.keys() if 'TWILIO' in k.upper()]}")
         app.logger.info("Twilio environment variables:")
-        for key in ['TWILIO_ENABLED', 'TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_FROM_NUMBER']:
-            value = os.getenv(key)
-            if key in ['TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN']:
+        for key in TWILIO_ENV_KEYS:
+            value = env[key]
+            if key in ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN'):
                 app.logger.info(f"{key}: {'SET' if value else 'NOT SET'}")
             else:
                 app.logger.info(f"{key}: {value}")
@@ -121,12 +180,7 @@ def init_services():
             return
             
         # Check required environment variables
-        required_vars = {
-            'OPENAI_API_KEY': os.getenv('OPENAI_API_KEY'),
-            'TWILIO_ACCOUNT_SID': os.getenv('TWILIO_ACCOUNT_SID'),
-            'TWILIO_AUTH_TOKEN': os.getenv('TWILIO_AUTH_TOKEN'),
-            'TWILIO_FROM_NUMBER': os.getenv('TWILIO_FROM_NUMBER')
-        }
+        required_vars = {key: env[key] for key in REQUIRED_ENV_KEYS}
         
         # Log each variable's presence (without exposing values)
         for var_name, value in required_vars.items():
@@ -144,24 +198,24 @@ def init_services():
             app.logger.error(f"Missing required variables: {', '.join(missing_vars)}")
             app.logger.error("Please configure all required environment variables in Render")
             app.logger.error("Current environment state:")
-            for key in os.environ:
-                if not any(secret in key.lower() for secret in ['key', 'token', 'secret', 'password']):
-                    app.logger.error(f"{key}: {os.getenv(key)}")
+            for key in LOGGABLE_ENV_KEYS:
+                app.logger.error("%s: %s", key, os.environ.get(key))
             return
 
         try:
             message_generator = MessageGenerator(required_vars['OPENAI_API_KEY'])
             user_config_service = UserConfigService(db.session)
             onboarding_service = OnboardingService(db.session, message_generator)
+            # db.session is a scoped proxy, so one detector serves every request
+            preference_detector = PreferenceDetector(db.session)
 
-            # Set up SSL context for Twilio requests
-            ssl_context = create_ssl_context()
-            urllib3.util.ssl_.DEFAULT_CERTS = certifi.where()
-            urllib3.util.ssl_.SSL_CONTEXT_FACTORY = lambda: ssl_context
+            # Point urllib3 at the certifi bundle; the Twilio session's adapter
+            # supplies its own shared SSL context (see sms_service)
+            urllib3.util.ssl_.DEFAULT_CERTS = _CA_BUNDLE
 
-            # Configure Twilio client to use our SSL context
+            # Configure Twilio client to use the same CA bundle
             import twilio.http.http_client
-            twilio.http.http_client.CA_BUNDLE = certifi.where()
+            twilio.http.http_client.CA_BUNDLE = _CA_BUNDLE
 
             # Initialize SMS service with detailed error handling
             try:
@@ -177,9 +231,10 @@ def init_services():
                     sms_service = notification_manager.sms_service
                     app.logger.info(f"Global sms_service set: {sms_service is not None}")
                     
-                    # Test SMS service initialization
-                    account = sms_service.client.api.accounts(required_vars['TWILIO_ACCOUNT_SID']).fetch()
-                    app.logger.info(f"Twilio account status: {account.status}")
+                    # Live account check costs a Twilio round-trip per worker, so it is opt-in
+                    if ENV_CONFIG.verify_twilio_on_boot == '1':
+                        account = sms_service.client.api.accounts(required_vars['TWILIO_ACCOUNT_SID']).fetch()
+                        app.logger.info(f"Twilio account status: {account.status}")
                 else:
                     app.logger.error("Failed to initialize SMS service through notification system")
                     sms_service = None
@@ -208,6 +263,30 @@ def ratelimit_handler(e):
         'retry_after': e.description
     }), 429
 
+UTC = timezone.utc
+# Look-ahead windows for the scheduler jobs
+_ONE_DAY = timedelta(days=1)
+_ONE_MINUTE = timedelta(minutes=1)
+
+# Schedule more messages once fewer than this many are pending for the next day
+PENDING_SCHEDULE_THRESHOLD = 10  # Arbitrary threshold, adjust based on user count
+
+def _pending_before(until):
+    """Filter criteria for pending messages due at or before the given time."""
+    return (
+        ScheduledMessage.status == 'pending',
+        ScheduledMessage.scheduled_time <= until
+    )
+
+def count_pending_messages(until, limit):
+    """Count pending messages due by the given time, stopping after limit rows."""
+    due = select(ScheduledMessage.id).where(*_pending_before(until)).limit(limit).subquery()
+    return db.session.execute(select(func.count()).select_from(due)).scalar()
+
+def has_pending_messages(until):
+    """Check whether any pending message is due by the given time."""
+    return db.session.execute(select(exists().where(*_pending_before(until)))).scalar()
+
 # Schedule background tasks
 @scheduler.task('interval', id='schedule_messages', minutes=5)  # Run every 5 minutes
 def schedule_daily_messages():
@@ -215,50 +294,40 @@ def schedule_daily_messages():
     with app.app_context():
         try:
             # Get count of pending messages for next 24 hours
-            next_day = datetime.now(pytz.UTC) + timedelta(days=1)
-            pending_count = ScheduledMessage.query.filter(
-                ScheduledMessage.status == 'pending',
-                ScheduledMessage.scheduled_time <= next_day
-            ).count()
+            next_day = datetime.now(UTC) + _ONE_DAY
+            pending_count = count_pending_messages(next_day, PENDING_SCHEDULE_THRESHOLD)
             
             # Only schedule if we have less than expected messages
-            if pending_count < 10:  # Arbitrary threshold, adjust based on user count
+            if pending_count < PENDING_SCHEDULE_THRESHOLD:
                 app.logger.info("Low pending message count, running scheduler")
                 result = message_scheduler.schedule_daily_messages()
-                app.logger.info(f"Daily message scheduling complete: {result}")
+                app.logger.info("Daily message scheduling complete: %s", result)
             else:
-                app.logger.info(f"Found {pending_count} pending messages, skipping scheduling")
+                app.logger.info("Found at least %d pending messages, skipping scheduling", pending_count)
                 
         except Exception as e:
-            app.logger.error(f"Error in daily message scheduling: {str(e)}")
+            app.logger.error("Error in daily message scheduling: %s", e)
 
 @scheduler.task('interval', id='process_messages', minutes=1)  # Check every minute
 def process_scheduled_messages():
     """Process scheduled messages that are due."""
     with app.app_context():
         try:
-            current_time = datetime.now(pytz.UTC)
-            
-            # Get count of messages due in the next minute
-            next_minute = current_time + timedelta(minutes=1)
-            pending_count = ScheduledMessage.query.filter(
-                ScheduledMessage.status == 'pending',
-                ScheduledMessage.scheduled_time <= next_minute
-            ).count()
+            current_time = datetime.now(UTC)
             
-            if pending_count > 0:
-                app.logger.info(f"Found {pending_count} messages to process")
+            # Only run the processor when something is due in the next minute
+            next_minute = current_time + _ONE_MINUTE
+            if has_pending_messages(next_minute):
+                app.logger.info("Found messages to process")
                 result = message_scheduler.process_scheduled_messages()
-                app.logger.info(f"Message processing complete: {result}")
+                app.logger.info("Message processing complete: %s", result)
                 
-                # Log any failures
-                if result['failed'] > 0:
-                    failed_messages = ScheduledMessage.query.filter_by(status='failed').all()
-                    for msg in failed_messages:
-                        app.logger.error(f"Failed message {msg.id} for recipient {msg.recipient_id}: {msg.error_message}")
+                # Log the failures from this run only
+                for msg in result.get('failed_messages', ()):
+                    app.logger.error("Failed message %s for recipient %s: %s", msg['id'], msg['recipient_id'], msg['error_message'])
                         
         except Exception as e:
-            app.logger.error(f"Error in message processing: {str(e)}")
+            app.logger.error("Error in message processing: %s", e)
 
 @scheduler.task('cron', id='cleanup_records', hour=3, minute=0)  # Run at 3 AM
 def cleanup_old_records():
@@ -266,53 +335,68 @@ def cleanup_old_records():
     with app.app_context():
         try:
             result = message_scheduler.cleanup_old_records()
-            app.logger.info(f"Database cleanup complete: {result}")
-        except Exception as e:
-            app.logger.error(f"Error in database cleanup: {str(e)}")
-
-# Add periodic scheduler check
-@scheduler.task('interval', id='check_scheduler', minutes=15)
-def check_scheduler():
-    """Periodically verify scheduler is running."""
-    with app.app_context():
-        try:
-            if not scheduler.running:
-                app.logger.warning("Scheduler not running, attempting to restart...")
-                scheduler.start()
-                if scheduler.running:
-                    app.logger.info("Successfully restarted scheduler")
-                    jobs = scheduler.get_jobs()
-                    for job in jobs:
-                        app.logger.info(f"Active job: {job.id} - Next run: {job.next_run_time}")
-                else:
-                    app.logger.error("Failed to restart scheduler")
+            app.logger.info("Database cleanup complete: %s", result)
         except Exception as e:
-            app.logger.error(f"Error checking scheduler: {str(e)}")
+            app.logger.error("Error in database cleanup: %s", e)
+
+# Built on first webhook from the cached auth token and reused
+_twilio_validator = None
+
+class _FastValidator(RequestValidator):
+    """
+    RequestValidator that keys its HMAC-SHA1 once and copies it per request,
+    instead of re-running the key setup on every signature.
+    """
+
+    def __init__(self, token):
+        super().__init__(token)
+        self._template = hmac.new(self.token, digestmod=hashlib.sha1)
+
+    def compute_signature(self, uri, params):
+        """Base64 HMAC-SHA1 over the URI followed by each sorted param name and its sorted values."""
+        mac = self._template.copy()
+        mac.update(uri.encode())
+        if params:
+            for name in sorted(set(params)):
+                for value in sorted(set(self.get_values(params, name))):
+                    mac.update(name.encode())
+                    mac.update(value.encode())
+        return base64.b64encode(mac.digest()).decode()
+
+def get_twilio_validator():
+    """Return the shared Twilio request validator."""
+    global _twilio_validator
+    if _twilio_validator is None:
+        _twilio_validator = _FastValidator(ENV_CONFIG.twilio_auth_token)
+    return _twilio_validator
 
 def validate_twilio_request(f):
     """Decorator to validate incoming Twilio requests."""
+    @functools.wraps(f)
     def decorated_function(*args, **kwargs):
         # Skip validation in debug mode
         if app.debug:
             app.logger.debug("Debug mode: Skipping Twilio request validation")
             return f(*args, **kwargs)
 
-        validator = RequestValidator(os.getenv('TWILIO_AUTH_TOKEN'))
+        headers = request.headers
         
         # Construct the full URL that Twilio would have signed
-        if request.headers.get('X-Forwarded-Proto'):
-            url = f"{request.headers.get('X-Forwarded-Proto')}://{request.headers.get('Host')}{request.path}"
+        forwarded_proto = headers.get('X-Forwarded-Proto')
+        if forwarded_proto:
+            url = f"{forwarded_proto}://{headers.get('Host')}{request.path}"
         else:
             url = request.url
 
-        app.logger.info(f"Validating Twilio request for URL: {url}")
-        app.logger.debug(f"Request headers: {dict(request.headers)}")
-        app.logger.debug(f"Request form data: {dict(request.form)}")
+        app.logger.debug("Validating Twilio request for URL: %s", url)
+        if app.logger.isEnabledFor(logging.DEBUG):
+            app.logger.debug("Request headers: %s", headers)
+            app.logger.debug("Request form data: %s", request.form)
         
-        request_valid = validator.validate(
+        request_valid = get_twilio_validator().validate(
             url,
             request.form,
-            request.headers.get('X-Twilio-Signature', '')
+            headers.get('X-Twilio-Signature', '')
         )
         
         if request_valid:
@@ -356,16 +440,197 @@ def update_user_config():
         })
         
     except Exception as e:
-        app.logger.error(f"Error updating user config: {str(e)}")
+        app.logger.error("Error updating user config: %s", e)
         return jsonify({'error': 'Internal server error'}), 500
 
+# Dialect inserts that support ON CONFLICT DO NOTHING
+UPSERT_INSERTS = {
+    'postgresql': pg_insert,
+    'sqlite': sqlite_insert
+}
+
+def create_recipient(phone_number):
+    """
+    Insert a new active recipient and return it, or None if the phone number
+    is already registered. The row comes back from INSERT ... RETURNING, so no
+    separate flush or lookup is needed.
+    """
+    values = {'phone_number': phone_number, 'timezone': 'UTC', 'is_active': True}
+    insert_factory = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert_factory is None:
+        recipient = Recipient(**values)
+        db.session.add(recipient)
+        db.session.flush()
+        return recipient
+    stmt = (
+        insert_factory(Recipient)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=['phone_number'])
+        .returning(Recipient)
+    )
+    return db.session.scalars(stmt).first()
+
+def store_detected_preferences(recipient_id, detected_prefs):
+    """Persist preferences detected from an inbound message."""
+    with app.app_context():
+        try:
+            preference_detector.save_preferences(recipient_id, detected_prefs)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Error saving detected preferences for user %s: %s", recipient_id, e)
+
+def _handle_stop(recipient, from_number):
+    """Unsubscribe the sender from daily messages."""
+    recipient.is_active = False
+    sms_service.handle_opt_out(from_number)
+    return "You've been unsubscribed from daily messages. Text START to resubscribe."
+
+def _handle_start(recipient, from_number):
+    """Resubscribe the sender to daily messages."""
+    recipient.is_active = True
+    sms_service.handle_opt_in(from_number)
+    return "Welcome back! You'll start receiving daily positive messages again."
+
+def _handle_restart(recipient, from_number):
+    """Restart onboarding for the sender."""
+    response_text = onboarding_service.start_onboarding(recipient.id)
+    app.logger.info("Restarted onboarding for user %s", recipient.id)
+    return response_text
+
+# SMS keyword commands, keyed on the upper-cased message body
+_COMMAND_HANDLERS = {
+    'STOP': _handle_stop,
+    'START': _handle_start,
+    'RESTART': _handle_restart
+}
+_MAX_COMMAND_LENGTH = max(map(len, _COMMAND_HANDLERS))
+
+# Inbound messages are answered off the request thread so Twilio gets its
+# response immediately; status callbacks stay inline since they are one UPDATE.
+# There is no broker: gunicorn's worker_exit hook drains this pool on shutdown
+# or recycling, and OpenAI/Twilio timeouts keep each message well under the
+# graceful timeout. Anything queued is lost if the process is killed outright.
+inbound_executor = ThreadPoolExecutor(max_workers=INBOUND_WORKERS, thread_name_prefix='inbound')
+
+def process_inbound_message(from_number, body):
+    """Record an inbound SMS, work out the reply and send it."""
+    with app.app_context():
+        try:
+            recipient = Recipient.query.filter_by(phone_number=from_number).first()
+            
+            is_new_user = False
+            if not recipient:
+                app.logger.info("Creating new recipient for %s", from_number)
+                recipient = create_recipient(from_number)
+                is_new_user = recipient is not None
+                if recipient is None:
+                    # A concurrent webhook created this sender first
+                    recipient = Recipient.query.filter_by(phone_number=from_number).first()
+                
+            if is_new_user:
+                # Send notification for new signup
+                try:
+                    asyncio.run(notification_manager.handle_user_signup(str(recipient.id)))
+                except Exception as e:
+                    app.logger.error("Failed to send signup notification: %s", e)
+            
+            # Analyze message for preferences
+            # Detection is cheap; saving it is deferred until after the reply is sent
+            detected_prefs = preference_detector.detect_preferences(body)
+            if detected_prefs:
+                app.logger.debug("Detected preferences for user %s: %s", recipient.id, detected_prefs)
+            
+            inbound_row = {
+                'recipient_id': recipient.id,
+                'message_type': 'inbound',
+                'content': body,
+                'status': 'received'
+            }
+            
+            # Commands are single short words; skip upper-casing longer messages
+            command_handler = _COMMAND_HANDLERS.get(body.upper()) if len(body) <= _MAX_COMMAND_LENGTH else None
+            if command_handler:
+                app.logger.debug("Processing %s command for %s", body, from_number)
+                response_text = command_handler(recipient, from_number)
+                
+            else:
+                # One lookup answers both onboarding questions
+                in_onboarding, onboarding_complete = (False, False) if is_new_user else onboarding_service.onboarding_status(recipient.id)
+                if not onboarding_complete:
+                    app.logger.debug("Handling onboarding for user %s", recipient.id)
+                    if not in_onboarding:
+                        response_text = onboarding_service.start_onboarding(recipient.id)
+                        app.logger.debug("Started onboarding for user %s", recipient.id)
+                    else:
+                        response_text, is_complete = onboarding_service.process_response(recipient.id, body, commit=False)
+                        app.logger.debug("Processed onboarding response for user %s, complete: %s", recipient.id, is_complete)
+                        if is_complete:
+                            # Release the config row before the OpenAI call for the welcome
+                            db.session.commit()
+                            response_text = onboarding_service.welcome_message(recipient.id)
+                else:
+                    app.logger.debug("Processing regular message for user %s", recipient.id)
+                    # Get user context including detected preferences
+                    user_context = user_config_service.get_gpt_prompt_context(recipient.id)
+                    if detected_prefs:
+                        user_context['preferences'] = {
+                            **(user_context.get('preferences', {})),
+                            **detected_prefs
+                        }
+                    response_text = message_generator.generate_response(body, user_context)
+                
+            # Write pending changes without ending the transaction; one commit covers everything
+            db.session.flush()
+            
+            app.logger.debug("Sending response: %s", response_text)
+            try:
+                send_result = sms_service.send_message(from_number, response_text)
+            except Exception:
+                # Keep the inbound message and state changes even when the reply fails
+                db.session.execute(insert(MessageLog), [inbound_row])
+                db.session.commit()
+                raise
+            
+            outbound_row = {
+                'recipient_id': recipient.id,
+                'message_type': 'outbound',
+                'content': response_text,
+                'status': send_result.get('delivery_status', 'queued'),
+                'twilio_sid': send_result.get('message_sid'),
+                'error_message': send_result.get('error_message'),
+                'price': send_result.get('price'),
+                'price_unit': send_result.get('price_unit')
+            }
+            
+            # Log both messages in one INSERT; the logs are never edited here, so skip the unit of work
+            _, outbound_id = db.session.scalars(
+                insert(MessageLog).returning(MessageLog.id, sort_by_parameter_order=True),
+                [inbound_row, outbound_row]
+            ).all()
+            db.session.commit()
+            app.logger.info("Replied to user %s (message %s)", recipient.id, outbound_id)
+            
+            if detected_prefs:
+                # Web processes do not run the scheduler; save on another inbound worker thread
+                inbound_executor.submit(store_detected_preferences, recipient.id, detected_prefs)
+            
+            # Send notification for message receipt
+            try:
+                asyncio.run(notification_manager.handle_message_receipt(str(recipient.id), str(outbound_id)))
+            except Exception as e:
+                app.logger.error("Failed to send message receipt notification: %s", e)
+                
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Error handling inbound message from %s: %s", from_number, e)
+
 @app.route('/webhook/inbound', methods=['POST'], endpoint='handle_inbound')
 @validate_twilio_request
 @limiter.limit("60/minute")  # Limit inbound messages
-async def handle_inbound_message():
-    """Handle incoming SMS messages."""
+def handle_inbound_message():
+    """Accept an incoming SMS and answer it in the background."""
     try:
-        app.logger.info("Received inbound message")
+        app.logger.debug("Received inbound message")
         
         if not sms_service:
             app.logger.warning("SMS service not initialized - environment variables may not be configured")
@@ -374,118 +639,20 @@ async def handle_inbound_message():
                 'message': 'The messaging service is currently being configured. Please try again later.'
             }), 503
 
-        app.logger.debug(f"Request form data: {request.form}")
+        app.logger.debug("Request form data: %s", request.form)
 
         from_number = request.form['From']
         body = request.form['Body'].strip()
-        upper_body = body.upper()
         
         if not sms_service.validate_phone_number(from_number):
-            app.logger.error(f"Invalid phone number received: {from_number}")
+            app.logger.error("Invalid phone number received: %s", from_number)
             return jsonify({'error': 'Invalid phone number'}), 400
         
-        recipient = Recipient.query.filter_by(phone_number=from_number).first()
-        
-        is_new_user = False
-        if not recipient:
-            app.logger.info(f"Creating new recipient for {from_number}")
-            recipient = Recipient(
-                phone_number=from_number,
-                timezone='UTC',
-                is_active=True
-            )
-            db.session.add(recipient)
-            db.session.flush()
-            is_new_user = True
-            
-            # Send notification for new signup
-            try:
-                await notification_manager.handle_user_signup(str(recipient.id))
-            except Exception as e:
-                app.logger.error(f"Failed to send signup notification: {str(e)}")
-        
-        # Initialize preference detector
-        preference_detector = PreferenceDetector(db.session)
-        
-        # Analyze message for preferences
-        detected_prefs = preference_detector.analyze_message(body, recipient.id)
-        if detected_prefs:
-            app.logger.info(f"Detected preferences for user {recipient.id}: {detected_prefs}")
-        
-        message_log = MessageLog(
-            recipient_id=recipient.id,
-            message_type='inbound',
-            content=body,
-            status='received'
-        )
-        db.session.add(message_log)
-        
-        if upper_body == 'STOP':
-            app.logger.info(f"Processing STOP command for {from_number}")
-            recipient.is_active = False
-            sms_service.handle_opt_out(from_number)
-            response_text = "You've been unsubscribed from daily messages. Text START to resubscribe."
-            
-        elif upper_body == 'START':
-            app.logger.info(f"Processing START command for {from_number}")
-            recipient.is_active = True
-            sms_service.handle_opt_in(from_number)
-            response_text = "Welcome back! You'll start receiving daily positive messages again."
-            
-        elif upper_body == 'RESTART':
-            app.logger.info(f"Processing RESTART command for {from_number}")
-            response_text = onboarding_service.start_onboarding(recipient.id)
-            app.logger.info(f"Restarted onboarding for user {recipient.id}")
-            
-        else:
-            if is_new_user or not onboarding_service.is_onboarding_complete(recipient.id):
-                app.logger.info(f"Handling onboarding for user {recipient.id}")
-                if is_new_user or not onboarding_service.is_in_onboarding(recipient.id):
-                    response_text = onboarding_service.start_onboarding(recipient.id)
-                    app.logger.info(f"Started onboarding for user {recipient.id}")
-                else:
-                    response_text, is_complete = onboarding_service.process_response(recipient.id, body)
-                    app.logger.info(f"Processed onboarding response for user {recipient.id}, complete: {is_complete}")
-            else:
-                app.logger.info(f"Processing regular message for user {recipient.id}")
-                # Get user context including detected preferences
-                user_context = user_config_service.get_gpt_prompt_context(recipient.id)
-                if detected_prefs:
-                    user_context['preferences'] = {
-                        **(user_context.get('preferences', {})),
-                        **detected_prefs
-                    }
-                response_text = message_generator.generate_response(body, user_context)
-            
-        # Commit the inbound message log first
-        db.session.commit()
-        
-        app.logger.info(f"Sending response: {response_text}")
-        send_result = sms_service.send_message(from_number, response_text)
-        
-        # Create and commit outbound message log
-        response_log = MessageLog(
-            recipient_id=recipient.id,
-            message_type='outbound',
-            content=response_text,
-            status=send_result.get('delivery_status', 'queued'),
-            twilio_sid=send_result.get('message_sid'),
-            error_message=send_result.get('error_message'),
-            price=send_result.get('price'),
-            price_unit=send_result.get('price_unit')
-        )
-        db.session.add(response_log)
-        db.session.commit()
-        
-        # Send notification for message receipt
-        try:
-            await notification_manager.handle_message_receipt(str(recipient.id), str(response_log.id))
-        except Exception as e:
-            app.logger.error(f"Failed to send message receipt notification: {str(e)}")
-        return jsonify({'status': 'success'})
+        inbound_executor.submit(process_inbound_message, from_number, body)
+        return jsonify({'status': 'accepted'}), 202
         
     except Exception as e:
-        app.logger.error(f"Error handling inbound message: {str(e)}")
+        app.logger.error("Error handling inbound message: %s", e)
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/webhook/status', methods=['POST'], endpoint='handle_status')
@@ -494,7 +661,7 @@ async def handle_inbound_message():
 def handle_status_callback():
     """Handle SMS delivery status callbacks."""
     try:
-        app.logger.info("Received status callback")
+        app.logger.debug("Received status callback")
         
         if not sms_service:
             app.logger.warning("SMS service not initialized - environment variables may not be configured")
@@ -503,64 +670,74 @@ def handle_status_callback():
                 'message': 'The messaging service is currently being configured. Please try again later.'
             }), 503
 
-        app.logger.debug(f"Status callback data: {request.form}")
+        app.logger.debug("Status callback data: %s", request.form)
 
         status_result = sms_service.process_delivery_status(request.form)
         
         if not status_result['processed']:
-            app.logger.error(f"Failed to process status callback: {status_result.get('error')}")
+            app.logger.error("Failed to process status callback: %s", status_result.get('error'))
             return jsonify({'error': 'Failed to process status'}), 400
         
-        message_log = MessageLog.query.filter_by(
-            twilio_sid=status_result['message_sid']
-        ).first()
+        message_sid = status_result['message_sid']
+        status_details = sms_service.get_message_status(message_sid)
         
-        if message_log:
-            status_details = sms_service.get_message_status(status_result['message_sid'])
-            
-            message_log.status = status_details['status']
-            message_log.error_message = status_details.get('error_message')
-            message_log.price = status_details.get('price')
-            message_log.price_unit = status_details.get('price_unit')
-            
-            db.session.commit()
-            app.logger.info(f"Updated message status: {status_details['status']} for SID: {status_result['message_sid']}")
+        # Update in place; no need to load the log row first
+        updated = db.session.execute(
+            update(MessageLog)
+            .where(MessageLog.twilio_sid == message_sid)
+            .values(
+                status=status_details['status'],
+                error_message=status_details.get('error_message'),
+                price=status_details.get('price'),
+                price_unit=status_details.get('price_unit')
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        
+        if updated:
+            app.logger.info("Updated message status: %s for SID: %s", status_details['status'], message_sid)
         else:
-            app.logger.warning(f"Message log not found for SID: {status_result['message_sid']}")
+            app.logger.warning("Message log not found for SID: %s", message_sid)
         
         return jsonify({'status': 'success'})
         
     except Exception as e:
-        app.logger.error(f"Error handling status callback: {str(e)}")
+        app.logger.error("Error handling status callback: %s", e)
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/health', methods=['GET'], endpoint='health_check')
-@limiter.exempt  # No rate limit for health checks
-def health_check():
-    """Health check endpoint."""
-    try:
-        db.session.execute('SELECT 1')
-        sms_service_status = "healthy" if sms_service else "unhealthy"
-        scheduler_status = "healthy" if scheduler.running else "unhealthy"
-        
-        return jsonify({
-            'status': 'healthy' if all([
-                sms_service_status == "healthy",
-                scheduler_status == "healthy"
-            ]) else 'degraded',
-            'components': {
-                'database': 'healthy',
-                'sms_service': sms_service_status,
-                'scheduler': scheduler_status
-            },
-            'timestamp': datetime.utcnow().isoformat()
-        })
-    except Exception as e:
-        app.logger.error(f"Health check failed: {str(e)}")
-        return jsonify({
-            'status': 'unhealthy',
-            'error': str(e)
-        }), 500
+_HEALTH_STMT = text('SELECT 1')
+# A healthy probe result is served for this many seconds
+HEALTH_DB_TTL = 5
+
+def health_payload():
+    """Probe the database and services; returns the status line and JSON body for /health."""
+    with app.app_context():
+        try:
+            db.session.execute(_HEALTH_STMT)
+            sms_service_status = "healthy" if sms_service else "unhealthy"
+            
+            return '200 OK', json.dumps({
+                'status': 'healthy' if sms_service_status == "healthy" else 'degraded',
+                'components': {
+                    'database': 'healthy',
+                    'sms_service': sms_service_status,
+                    # Web workers leave the jobs to the separate scheduler worker
+                    'scheduler': 'healthy' if scheduler.running else 'external'
+                },
+                'timestamp': datetime.utcnow().isoformat()
+            }).encode()
+        except Exception as e:
+            app.logger.error("Health check failed: %s", e)
+            return '500 INTERNAL SERVER ERROR', json.dumps({
+                'status': 'unhealthy',
+                'error': str(e)
+            }).encode()
+        finally:
+            db.session.remove()
+
+# Answer /health ahead of Flask routing and the rate limiter
+app.wsgi_app = HealthInterceptor(app.wsgi_app, health_payload, ttl=HEALTH_DB_TTL)
 
 def ensure_scheduler_running():
     """Ensure the scheduler is running and restart if needed."""
@@ -572,24 +749,38 @@ def ensure_scheduler_running():
                 app.logger.info("Successfully restarted scheduler")
                 jobs = scheduler.get_jobs()
                 for job in jobs:
-                    app.logger.info(f"Active job: {job.id} - Next run: {job.next_run_time}")
+                    app.logger.info("Active job: %s - Next run: %s", job.id, job.next_run_time)
             else:
                 app.logger.error("Failed to restart scheduler")
         except Exception as e:
             app.logger.error(f"Error starting scheduler: {str(e)}")
 
-def init_app():
-    """Initialize the Flask application."""
+def on_scheduler_event(event):
+    """Log failed or missed jobs and make sure the scheduler is still up."""
+    if event.code == EVENT_JOB_ERROR:
+        app.logger.error("Scheduled job %s failed: %s", event.job_id, event.exception)
+    else:
+        app.logger.warning("Scheduled job %s missed its run time", event.job_id)
+    ensure_scheduler_running()
+
+def init_app(create_tables: bool = True):
+    """
+    Initialize the Flask application.
+
+    The scheduler worker passes ``create_tables=False`` and leaves the schema
+    to the web service's migrations.
+    """
     with app.app_context():
         try:
             # Initialize database
-            db.create_all()
+            if create_tables:
+                db.create_all()
             
             # Initialize services
             init_services()
             
             # Initialize and start scheduler only if not in migration
-            if not os.getenv('FLASK_DB_MIGRATE'):
+            if not ENV_CONFIG.flask_db_migrate:
                 scheduler.init_app(app)
                 scheduler.start()
                 
@@ -598,15 +789,12 @@ def init_app():
                     app.logger.info("Scheduler started successfully")
                     jobs = scheduler.get_jobs()
                     for job in jobs:
-                        app.logger.info(f"Scheduled job: {job.id} - Next run: {job.next_run_time}")
+                        app.logger.info("Scheduled job: %s - Next run: %s", job.id, job.next_run_time)
                 else:
                     app.logger.error("Failed to start scheduler")
                     
-                # Add periodic scheduler check
-                @scheduler.task('interval', id='check_scheduler', minutes=15)
-                def check_scheduler():
-                    """Periodically verify scheduler is running."""
-                    ensure_scheduler_running()
+                # React to failed or missed jobs instead of polling the scheduler
+                scheduler.add_listener(on_scheduler_event, EVENT_JOB_ERROR | EVENT_JOB_MISSED)
             
             app.logger.info("Application initialized successfully")
             
@@ -623,6 +811,6 @@ if __name__ == '__main__':
     import asyncio
     
     config = hypercorn.Config()
-    config.bind = [f"0.0.0.0:{int(os.getenv('PORT', 5000))}"]
+    config.bind = [f"0.0.0.0:{int(ENV_CONFIG.port or 5000)}"]
     
     asyncio.run(hypercorn.asyncio.serve(asgi_app, config))
@@ -0,0 +1,27 @@
+"""
+Gunicorn settings for the web workers.
+
+Usage:
+    gunicorn --config python:src.features.web_app.gunicorn_conf src.features.web_app.code:app
+"""
+
+import multiprocessing
+import os
+
+# The handlers block on SQLAlchemy and Twilio, so scale with processes and threads
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_class = 'gthread'
+# Time a stopping worker gets to finish requests and queued inbound messages
+graceful_timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+
+def post_fork(server, worker):
+    """Build the services in each worker so every process warms its own DB pool and SSLContext."""
+    from src.features.web_app.code import app, init_services
+    with app.app_context():
+        init_services()
+
+def worker_exit(server, worker):
+    """Finish inbound messages already accepted with a 202 before the worker exits."""
+    from src.features.web_app.code import inbound_executor
+    inbound_executor.shutdown(wait=True)
@@ -0,0 +1,44 @@
+"""
+Health Check Interceptor
+------------------------
+Description: WSGI middleware that answers GET /health before Flask routing,
+    so monitor probes skip request context setup, the rate limiter and the
+    session teardown.
+Dependencies:
+  - web_app
+"""
+
+import time
+from typing import Callable, Iterable, Tuple
+
+# (status line, JSON body) produced by the probe
+HealthResponse = Tuple[str, bytes]
+
+class HealthInterceptor:
+    """Serve health probes directly and hand every other request to the wrapped app."""
+
+    def __init__(self, app: Callable, probe: Callable[[], HealthResponse], ttl: float = 5.0, path: str = '/health'):
+        """Wrap a WSGI app; healthy probe results are reused for ``ttl`` seconds."""
+        self.app = app
+        self.probe = probe
+        self.ttl = ttl
+        self.path = path
+        self._cached = (0.0, None)
+
+    def __call__(self, environ, start_response) -> Iterable[bytes]:
+        if environ.get('PATH_INFO') != self.path or environ.get('REQUEST_METHOD') != 'GET':
+            return self.app(environ, start_response)
+
+        checked_at, response = self._cached
+        now = time.monotonic()
+        if response is None or now - checked_at >= self.ttl:
+            response = self.probe()
+            # Failures are re-probed on the next request
+            self._cached = (now, response if response[0].startswith('200') else None)
+
+        status, body = response
+        start_response(status, [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body)))
+        ])
+        return [body]
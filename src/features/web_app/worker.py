@@ -0,0 +1,30 @@
+"""
+Scheduler worker: runs the periodic jobs (message scheduling, delivery,
+cleanup) in a dedicated process so they never compete with webhook
+requests in the web workers.
+
+Usage:
+    python -m src.features.web_app.worker
+"""
+
+import signal
+import threading
+from src.features.web_app.code import app, init_app, scheduler
+
+def main():
+    """Start the scheduler and block until the process is told to stop."""
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    # The web service owns the schema; creating tables here would race its migrations
+    init_app(create_tables=False)
+    app.logger.info("Scheduler worker running")
+    stop.wait()
+
+    if scheduler.running:
+        scheduler.shutdown()
+    app.logger.info("Scheduler worker stopped")
+
+if __name__ == '__main__':
+    main()
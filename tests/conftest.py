@@ -1,40 +1,48 @@
 import pytest
 import os
-from src.app import app, db
-from src.message_generator import MessageGenerator
-from src.sms_service import SMSService
+
+# The app reads its configuration at import time, so set the environment first
+os.environ['TESTING'] = 'true'
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+os.environ['OPENAI_API_KEY'] = 'test_api_key'
+os.environ['TWILIO_ACCOUNT_SID'] = 'test_sid'
+os.environ['TWILIO_AUTH_TOKEN'] = 'test_token'
+os.environ['TWILIO_FROM_NUMBER'] = '+1234567890'
+
+from src.features.core.code import db
+from src.features.web_app.code import app
+from src.features.message_generation.code import MessageGenerator
+from src.features.notification_system.code import SMSService
 
 def pytest_configure(config):
     """Configure test environment."""
-    os.environ['TESTING'] = 'true'
-    os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
-    os.environ['OPENAI_API_KEY'] = 'test_api_key'
-    os.environ['TWILIO_ACCOUNT_SID'] = 'test_sid'
-    os.environ['TWILIO_AUTH_TOKEN'] = 'test_token'
-    os.environ['TWILIO_FROM_NUMBER'] = '+1234567890'
-
-    # Configure Flask app for testing
     app.config.update({
-        'TESTING': True,
-        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
-        'SQLALCHEMY_TRACK_MODIFICATIONS': False
+        'TESTING': True
     })
-    
-    # Ensure database is using SQLite configuration
-    db.init_app(app)
 
 @pytest.fixture(scope="session", autouse=True)
 def test_database():
     """Create a test database and tables."""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import scoped_session, sessionmaker
-
-    # Create test engine
-    engine = create_engine('sqlite:///:memory:')
-    db.session = scoped_session(sessionmaker(bind=engine))
-    db.engine = engine
+    # Flask-SQLAlchemy gives in-memory SQLite a StaticPool with
+    # check_same_thread=False, so every session sees this one database
+    # (each xdist worker process gets its own)
+    from sqlalchemy import event
 
     with app.app_context():
+        engine = db.engine
+
+        # pysqlite manages transactions itself and breaks SAVEPOINT handling;
+        # hand control to SQLAlchemy so each test's rollback really discards it
+        @event.listens_for(engine, "connect")
+        def disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def emit_begin(connection):
+            connection.exec_driver_sql("BEGIN")
+
+        # Reconnect so the listeners apply to the shared connection
+        engine.dispose()
         db.create_all()
         yield db.session
         db.session.remove()
@@ -42,13 +50,15 @@ def test_database():
 
 @pytest.fixture(scope="function")
 def db_session(test_database):
-    """Create a new database session for a test."""
+    """Create a new database session for a test, rolled back afterwards."""
+    from sqlalchemy.orm import Session
+
     with app.app_context():
         connection = db.engine.connect()
         transaction = connection.begin()
         
-        # Get session
-        session = db.session
+        # Bind the session to the test transaction; commits only release a SAVEPOINT
+        session = Session(bind=connection, join_transaction_mode="create_savepoint")
         
         yield session
         
@@ -74,7 +84,6 @@ def sms_service():
 @pytest.fixture(scope="function")
 def app_client():
     """Create a test client for the Flask application."""
-    from src.app import app
     app.config['TESTING'] = True
     app.config['SERVER_NAME'] = 'localhost'
     
@@ -122,7 +131,7 @@ def mock_twilio():
 @pytest.fixture(scope="function")
 def test_recipient(db_session):
     """Create a test recipient in the database."""
-    from src.models import Recipient
+    from src.features.core.code import Recipient
     
     recipient = Recipient(
         phone_number="+1234567890",
@@ -137,7 +146,7 @@ def test_recipient(db_session):
 @pytest.fixture(scope="function")
 def test_message_log(db_session, test_recipient):
     """Create a test message log in the database."""
-    from src.models import MessageLog
+    from src.features.core.code import MessageLog
     
     message_log = MessageLog(
         recipient_id=test_recipient.id,
@@ -154,7 +163,7 @@ def test_message_log(db_session, test_recipient):
 @pytest.fixture(scope="function")
 def test_scheduled_message(db_session, test_recipient):
     """Create a test scheduled message in the database."""
-    from src.models import ScheduledMessage
+    from src.features.core.code import ScheduledMessage
     from datetime import datetime, timedelta
     import pytz
     
@@ -183,8 +192,3 @@ def pytest_unconfigure(config):
     ]
     for var in test_vars:
         os.environ.pop(var, None)
-    
-    # Clean up database
-    with app.app_context():
-        db.session.remove()
-        db.drop_all()
@@ -133,7 +133,7 @@ def test_complete_onboarding_flow(client, db_session, mocker):
     assert config.personal_info['interests'] == ["coding", "hiking"]
     assert config.preferences['communication_style'] == 'casual'
     assert config.preferences['message_time'] == 'morning'
-    assert config.preferences['onboarding_complete'] is True
+    assert config.onboarding_complete is True
     assert 'onboarding_step' not in config.preferences
     
     # Verify message logs were created
@@ -245,8 +245,8 @@ def test_regular_message_after_onboarding(client, db_session, mocker):
     config = UserConfig(
         recipient_id=recipient.id,
         name="John Doe",
+        onboarding_complete=True,
         preferences={
-            'onboarding_complete': True,
             'communication_style': 'casual',
             'message_time': 'morning'
         },
@@ -1,15 +1,23 @@
 import pytest
-from src.onboarding_service import OnboardingService
-from src.models import Recipient, UserConfig
+from unittest.mock import Mock
+from src.features.core.code import OnboardingStage, Recipient, UserConfig
+from src.features.user_management.code import OnboardingService
 
-def test_start_onboarding(db_session):
+@pytest.fixture
+def stub_generator():
+    """Message generator that returns a fixed welcome without calling OpenAI."""
+    generator = Mock()
+    generator.generate_message.return_value = "Welcome aboard!"
+    return generator
+
+def test_start_onboarding(db_session, stub_generator):
     """Test starting the onboarding process."""
     # Create a test recipient
     recipient = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
     db_session.add(recipient)
     db_session.flush()
     
-    service = OnboardingService(db_session)
+    service = OnboardingService(db_session, stub_generator)
     
     # Start onboarding
     first_message = service.start_onboarding(recipient.id)
@@ -26,14 +34,14 @@ def test_start_onboarding(db_session):
     assert config.name is None
     assert recipient.timezone == 'America/Chicago'
 
-def test_process_responses(db_session):
+def test_process_responses(db_session, stub_generator):
     """Test processing responses through the onboarding flow."""
     # Create a test recipient and config
     recipient = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
     db_session.add(recipient)
     db_session.flush()
     
-    service = OnboardingService(db_session)
+    service = OnboardingService(db_session, stub_generator)
     service.start_onboarding(recipient.id)
     
     # Test name step
@@ -81,10 +89,10 @@ def test_process_responses(db_session):
     assert config.personal_info['interests'] == ["coding", "hiking", "reading"]
     assert config.preferences['communication_style'] == 'casual'
     assert config.preferences['message_time'] == 'morning'
-    assert config.preferences['onboarding_complete'] is True
+    assert config.onboarding_complete is True
     assert 'onboarding_step' not in config.preferences
 
-def test_restart_onboarding(db_session):
+def test_restart_onboarding(db_session, stub_generator):
     """Test restarting onboarding for an existing user."""
     # Create user with existing config
     recipient = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
@@ -100,7 +108,7 @@ def test_restart_onboarding(db_session):
     db_session.add(config)
     db_session.commit()
     
-    service = OnboardingService(db_session)
+    service = OnboardingService(db_session, stub_generator)
     
     # Restart onboarding
     first_message = service.start_onboarding(recipient.id)
@@ -113,13 +121,13 @@ def test_restart_onboarding(db_session):
     assert config.name is None
     assert recipient.timezone == 'America/Chicago'
 
-def test_invalid_style(db_session):
+def test_invalid_style(db_session, stub_generator):
     """Test handling invalid communication style selection."""
     recipient = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
     db_session.add(recipient)
     db_session.flush()
     
-    service = OnboardingService(db_session)
+    service = OnboardingService(db_session, stub_generator)
     service.start_onboarding(recipient.id)
     
     # Get to style step
@@ -136,13 +144,13 @@ def test_invalid_style(db_session):
     config = db_session.query(UserConfig).filter_by(recipient_id=recipient.id).first()
     assert config.preferences['onboarding_step'] == 'style'
 
-def test_invalid_timing(db_session):
+def test_invalid_timing(db_session, stub_generator):
     """Test handling invalid timing preference."""
     recipient = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
     db_session.add(recipient)
     db_session.flush()
     
-    service = OnboardingService(db_session)
+    service = OnboardingService(db_session, stub_generator)
     service.start_onboarding(recipient.id)
     
     # Get to timing step
@@ -160,13 +168,13 @@ def test_invalid_timing(db_session):
     config = db_session.query(UserConfig).filter_by(recipient_id=recipient.id).first()
     assert config.preferences['onboarding_step'] == 'timing'
 
-def test_invalid_confirmation(db_session):
+def test_invalid_confirmation(db_session, stub_generator):
     """Test handling invalid confirmation response."""
     recipient = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
     db_session.add(recipient)
     db_session.flush()
     
-    service = OnboardingService(db_session)
+    service = OnboardingService(db_session, stub_generator)
     service.start_onboarding(recipient.id)
     
     # Get to confirmation step
@@ -185,13 +193,13 @@ def test_invalid_confirmation(db_session):
     config = db_session.query(UserConfig).filter_by(recipient_id=recipient.id).first()
     assert config.preferences['onboarding_step'] == 'confirmation'
 
-def test_is_onboarding_complete(db_session):
+def test_is_onboarding_complete(db_session, stub_generator):
     """Test checking onboarding completion status."""
     recipient = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
     db_session.add(recipient)
     db_session.flush()
     
-    service = OnboardingService(db_session)
+    service = OnboardingService(db_session, stub_generator)
     
     # Should be false for new user
     assert not service.is_onboarding_complete(recipient.id)
@@ -208,13 +216,13 @@ def test_is_onboarding_complete(db_session):
     # Should be true after completion
     assert service.is_onboarding_complete(recipient.id)
 
-def test_is_in_onboarding(db_session):
+def test_is_in_onboarding(db_session, stub_generator):
     """Test checking if user is in onboarding process."""
     recipient = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
     db_session.add(recipient)
     db_session.flush()
     
-    service = OnboardingService(db_session)
+    service = OnboardingService(db_session, stub_generator)
     
     # Should be false for new user
     assert not service.is_in_onboarding(recipient.id)
@@ -233,3 +241,66 @@ def test_is_in_onboarding(db_session):
     
     # Should be false after completion
     assert not service.is_in_onboarding(recipient.id)
+
+def test_bulk_onboarding_status(db_session, stub_generator):
+    """Test reading onboarding status for several users in one call."""
+    new_user = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
+    onboarding_user = Recipient(phone_number='+1234567891', timezone='UTC', is_active=True)
+    db_session.add_all([new_user, onboarding_user])
+    db_session.flush()
+    
+    service = OnboardingService(db_session, stub_generator)
+    service.start_onboarding(onboarding_user.id)
+    
+    status = service.bulk_onboarding_status([new_user.id, onboarding_user.id])
+    
+    assert status == {
+        new_user.id: (False, False),
+        onboarding_user.id: (True, False)
+    }
+    assert service.bulk_onboarding_status([]) == {}
+
+def test_process_response_without_commit(db_session, stub_generator):
+    """Test that commit=False leaves the welcome to the caller."""
+    recipient = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
+    db_session.add(recipient)
+    db_session.flush()
+    
+    service = OnboardingService(db_session, stub_generator)
+    service.start_onboarding(recipient.id)
+    service.process_response(recipient.id, "John Doe", commit=False)
+    service.process_response(recipient.id, "coding, hiking", commit=False)
+    service.process_response(recipient.id, "1", commit=False)
+    
+    # The final answer completes onboarding but generates no welcome yet
+    message, complete = service.process_response(recipient.id, "09:00", commit=False)
+    assert complete
+    assert message == ''
+    assert service.is_onboarding_complete(recipient.id)
+    stub_generator.generate_message.assert_not_called()
+    
+    # The caller commits, then asks for the welcome
+    db_session.commit()
+    assert service.welcome_message(recipient.id) == "Welcome aboard!"
+    stub_generator.generate_message.assert_called_once()
+
+def test_process_response_without_commit_leaves_rollback_to_caller(db_session, stub_generator):
+    """Test that commit=False does not roll back the caller's transaction on errors."""
+    recipient = Recipient(phone_number='+1234567890', timezone='UTC', is_active=True)
+    db_session.add(recipient)
+    db_session.flush()
+    
+    service = OnboardingService(db_session, stub_generator)
+    service.start_onboarding(recipient.id)
+    
+    # Work the caller flushed before handing over to onboarding
+    other = Recipient(phone_number='+1234567891', timezone='UTC', is_active=True)
+    db_session.add(other)
+    db_session.flush()
+    
+    with pytest.raises(RuntimeError):
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setitem(OnboardingService._STAGE_HANDLERS, OnboardingStage.NAME, Mock(side_effect=RuntimeError("boom")))
+            service.process_response(recipient.id, "John Doe", commit=False)
+    
+    assert db_session.query(Recipient).filter_by(phone_number='+1234567891').first() is other
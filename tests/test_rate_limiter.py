@@ -1,7 +1,8 @@
 import pytest
+import time
 from unittest.mock import Mock, patch
 from datetime import datetime, timedelta
-from src.rate_limiter import APIRateLimiter, rate_limit_openai, rate_limit_sms
+from src.features.rate_limiting.code import APIRateLimiter, rate_limit_openai, rate_limit_sms
 
 def test_openai_rate_limiter():
     """Test OpenAI API rate limiting."""
@@ -11,19 +12,36 @@ def test_openai_rate_limiter():
     assert limiter.check_openai_limit(100) is True
     assert limiter.check_openai_limit(100) is True
     
-    # Should reject when token limit exceeded
-    limiter.openai_limits['token_count'] = 9900
+    # Should reject when the token allowance is spent
+    limiter.openai_limits['token_allowance'] = 100
     assert limiter.check_openai_limit(200) is False
     
-    # Should reject when request limit exceeded
-    limiter.openai_limits['request_count'] = 49
+    # Should reject when the request allowance is spent
+    limiter.openai_limits['request_allowance'] = 0.5
     assert limiter.check_openai_limit(50) is False
     
-    # Should reset after minute passes
-    limiter.openai_limits['last_reset'] = datetime.now() - timedelta(minutes=1)
+    # Should refill after a minute passes
+    limiter.openai_limits['last_refill'] = time.monotonic() - 60
     assert limiter.check_openai_limit(100) is True
-    assert limiter.openai_limits['token_count'] == 100
-    assert limiter.openai_limits['request_count'] == 1
+    assert limiter.openai_limits['token_allowance'] == pytest.approx(limiter.openai_limits['tokens_per_min'] - 100)
+    assert limiter.openai_limits['request_allowance'] == pytest.approx(limiter.openai_limits['requests_per_min'] - 1)
+
+def test_openai_wait_time():
+    """Test the OpenAI wait estimate used by async callers."""
+    limiter = APIRateLimiter()
+    
+    # Allowed calls take from the buckets and need no wait
+    assert limiter.openai_wait_time(100) == 0
+    
+    # An empty request bucket reports the time until one request refills
+    limiter.openai_limits['request_allowance'] = 0
+    wait = limiter.openai_wait_time(100)
+    assert wait == pytest.approx(60 / limiter.openai_limits['requests_per_min'], rel=0.05)
+    assert limiter.openai_limits['request_allowance'] < 1
+    
+    # Once that time has passed the call is allowed
+    limiter.openai_limits['last_refill'] = time.monotonic() - wait
+    assert limiter.openai_wait_time(100) == 0
 
 def test_sms_rate_limiter():
     """Test SMS rate limiting."""
@@ -2,8 +2,8 @@ import pytest
 from unittest.mock import Mock, patch
 from datetime import datetime, timedelta
 import pytz
-from src.scheduler import MessageScheduler
-from src.models import Recipient, ScheduledMessage, MessageLog
+from src.features.message_generation.scheduler import MessageScheduler
+from src.features.core.code import Recipient, ScheduledMessage, MessageLog
 
 @pytest.fixture
 def mock_db_session():
@@ -11,7 +11,9 @@ def mock_db_session():
 
 @pytest.fixture
 def mock_message_generator():
-    return Mock()
+    generator = Mock()
+    generator.generate_messages.side_effect = lambda contexts: ["Test message"] * len(contexts)
+    return generator
 
 @pytest.fixture
 def mock_sms_service():
@@ -19,7 +21,9 @@ def mock_sms_service():
 
 @pytest.fixture
 def mock_user_config_service():
-    return Mock()
+    service = Mock()
+    service.get_gpt_prompt_context.return_value = {'preferences': {'message_time': '09:00'}}
+    return service
 
 @pytest.fixture
 def scheduler(mock_db_session, mock_message_generator, mock_sms_service, mock_user_config_service):
@@ -34,7 +38,7 @@ def test_schedule_daily_messages_success(scheduler, mock_db_session):
     # Mock active recipients
     recipient1 = Mock(spec=Recipient, id=1, timezone='UTC')
     recipient2 = Mock(spec=Recipient, id=2, timezone='America/New_York')
-    mock_db_session.query.return_value.filter_by.return_value.all.return_value = [
+    mock_db_session.query.return_value.options.return_value.filter_by.return_value.all.return_value = [
         recipient1, recipient2
     ]
     
@@ -43,14 +47,17 @@ def test_schedule_daily_messages_success(scheduler, mock_db_session):
     assert result['scheduled'] == 2
     assert result['failed'] == 0
     assert result['total'] == 2
-    assert mock_db_session.add.call_count == 2
+    mock_db_session.execute.assert_called_once()
+    rows = mock_db_session.execute.call_args[0][1]
+    assert [row['recipient_id'] for row in rows] == [1, 2]
+    assert all(row['status'] == 'pending' for row in rows)
     mock_db_session.commit.assert_called_once()
 
 def test_schedule_daily_messages_partial_failure(scheduler, mock_db_session):
     # Mock one successful and one failed recipient
     recipient1 = Mock(spec=Recipient, id=1, timezone='UTC')
     recipient2 = Mock(spec=Recipient, id=2, timezone='Invalid/Timezone')
-    mock_db_session.query.return_value.filter_by.return_value.all.return_value = [
+    mock_db_session.query.return_value.options.return_value.filter_by.return_value.all.return_value = [
         recipient1, recipient2
     ]
     
@@ -65,14 +72,13 @@ def test_process_scheduled_messages_success(scheduler, mock_db_session, mock_mes
     # Mock scheduled messages
     message1 = Mock(spec=ScheduledMessage, id=1, recipient_id=1)
     message2 = Mock(spec=ScheduledMessage, id=2, recipient_id=2)
-    mock_db_session.query.return_value.filter.return_value.all.return_value = [
-        message1, message2
-    ]
     
-    # Mock recipients
+    # Mock recipients, loaded alongside their messages
     recipient1 = Mock(spec=Recipient, id=1, phone_number='+1234567890', is_active=True)
     recipient2 = Mock(spec=Recipient, id=2, phone_number='+0987654321', is_active=True)
-    mock_db_session.query.return_value.get.side_effect = [recipient1, recipient2]
+    mock_db_session.query.return_value.outerjoin.return_value.filter.return_value.all.return_value = [
+        (message1, recipient1), (message2, recipient2)
+    ]
     
     # Mock message generation and sending
     mock_message_generator.generate_message.return_value = "Test message"
@@ -92,11 +98,12 @@ def test_process_scheduled_messages_success(scheduler, mock_db_session, mock_mes
 def test_process_scheduled_messages_inactive_recipient(scheduler, mock_db_session):
     # Mock scheduled message
     message = Mock(spec=ScheduledMessage, id=1, recipient_id=1)
-    mock_db_session.query.return_value.filter.return_value.all.return_value = [message]
     
     # Mock inactive recipient
     recipient = Mock(spec=Recipient, id=1, is_active=False)
-    mock_db_session.query.return_value.get.return_value = recipient
+    mock_db_session.query.return_value.outerjoin.return_value.filter.return_value.all.return_value = [
+        (message, recipient)
+    ]
     
     result = scheduler.process_scheduled_messages()
     
@@ -109,11 +116,12 @@ def test_process_scheduled_messages_inactive_recipient(scheduler, mock_db_sessio
 def test_process_scheduled_messages_send_failure(scheduler, mock_db_session, mock_message_generator, mock_sms_service):
     # Mock scheduled message
     message = Mock(spec=ScheduledMessage, id=1, recipient_id=1)
-    mock_db_session.query.return_value.filter.return_value.all.return_value = [message]
     
     # Mock active recipient
     recipient = Mock(spec=Recipient, id=1, phone_number='+1234567890', is_active=True)
-    mock_db_session.query.return_value.get.return_value = recipient
+    mock_db_session.query.return_value.outerjoin.return_value.filter.return_value.all.return_value = [
+        (message, recipient)
+    ]
     
     # Mock message generation and failed sending
     mock_message_generator.generate_message.return_value = "Test message"